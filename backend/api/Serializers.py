@@ -1,15 +1,18 @@
 import base64
+import json
 
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.db import transaction
-from django.db.models import F
 
 from rest_framework import serializers
-from rest_framework.generics import get_object_or_404
+from rest_framework.utils import html
 
 from djoser.serializers import UserCreateSerializer
 
+from api.timing import TimedRepresentationMixin
+from recipes.images import schedule_image_processing
 from recipes.models import (
     Recipe,
     Ingredient,
@@ -18,6 +21,7 @@ from recipes.models import (
     Favorite,
     IngredientRecipe,
     Subscription,
+    ShoppingCartItem,
 )
 
 User = get_user_model()
@@ -58,7 +62,8 @@ class UserCreateSerializer(UserCreateSerializer):
         }
 
 
-class UserReadSerializer(serializers.ModelSerializer):
+class UserReadSerializer(TimedRepresentationMixin,
+                         serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -72,6 +77,9 @@ class UserReadSerializer(serializers.ModelSerializer):
             'is_subscribed')
 
     def get_is_subscribed(self, obj):
+        subscriptions = self.context.get('subscriptions')
+        if subscriptions is not None:
+            return obj.id in subscriptions
         user = self.context['request'].user
         if user.is_anonymous:
             return False
@@ -79,7 +87,8 @@ class UserReadSerializer(serializers.ModelSerializer):
             author=obj).exists()
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedRepresentationMixin,
+                    serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = (
@@ -90,7 +99,8 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = '__all__',
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedRepresentationMixin,
+                           serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = '__all__'
@@ -107,12 +117,14 @@ class IngredientsEditSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedRepresentationMixin,
+                       serializers.ModelSerializer):
     author = UserReadSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField()
     tags = TagSerializer(many=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -124,27 +136,47 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'is_in_shopping_cart',
                   'name',
                   'image',
+                  'image_width',
+                  'image_height',
+                  'image_srcset',
                   'text',
                   'cooking_time',
                   )
 
     def get_ingredients(self, obj):
-        recipe = obj
-        ingredients = recipe.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('recipe_ingredients__amount')
-        )
-        return ingredients
+        return [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in obj.ingredient_recipes.all()
+        ]
+
+    def get_image_srcset(self, obj):
+        request = self.context.get('request')
+        srcset = {}
+        for extension, widths in obj.image_variants.items():
+            srcset[extension] = ', '.join(
+                '{} {}w'.format(
+                    request.build_absolute_uri(default_storage.url(name)),
+                    width)
+                for width, name in sorted(
+                    widths.items(), key=lambda item: int(item[0])))
+        return srcset
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         if user.is_authenticated:
             return obj.favorites.filter(user=user).exists()
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         if user.is_authenticated:
             return obj.shopping_list.filter(user=user).exists()
@@ -161,14 +193,48 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
-class RecipeCreateSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(TimedRepresentationMixin,
+                            serializers.ModelSerializer):
+    image = serializers.ImageField()
+
+    class Meta:
+        model = Recipe
+        fields = ('image',)
+
+    def update(self, instance, validated_data):
+        if self.is_current_image(instance, validated_data.get('image')):
+            validated_data.pop('image')
+        if 'image' in validated_data:
+            validated_data['image_variants'] = {}
+            validated_data['image_width'] = None
+            validated_data['image_height'] = None
+        instance = super().update(instance, validated_data)
+        if validated_data.get('image'):
+            schedule_image_processing(instance)
+        return instance
+
+    @staticmethod
+    def is_current_image(instance, image):
+        if not image or not instance.image:
+            return False
+        field = instance.image.field
+        name = field.storage.hashed_name(
+            field.generate_filename(instance, image.name), image)
+        return name == instance.image.name
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        instance = Recipe.objects.with_related().with_user_flags(
+            request.user).get(pk=instance.pk)
+        return RecipeSerializer(instance, context=self.context).data
+
+
+class RecipeCreateSerializer(RecipeImageSerializer):
     image = Base64ImageField(
         required=False,
         allow_null=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all(),
-        required=True,
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
         write_only=True)
     ingredients = IngredientsEditSerializer(
         many=True)
@@ -176,38 +242,37 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = '__all__'
-        read_only_fields = ('author',)
-
-    def validate(self, data):
-        ingredients = data['ingredients']
-        ingredient_list = []
-        for items in ingredients:
-            ingredient = get_object_or_404(
-                Ingredient, id=items['id'])
-            if ingredient in ingredient_list:
-                raise serializers.ValidationError(
-                    'Ингредиент должен быть уникальным!')
-            ingredient_list.append(ingredient)
-        tags = data['tags']
-        if not tags:
-            raise serializers.ValidationError(
-                'Нужен хотя бы один тэг для рецепта!')
-        tag_ids = [
-            tag.id if isinstance(tag, Tag) else tag for tag in tags]
-        tags = Tag.objects.filter(id__in=tag_ids)
-        if len(tag_ids) != len(tags):
-            invalid_tags = [
-                tag_id
-                for tag_id in tag_ids
-                if tag_id not in tags.values_list('id', flat=True)
-            ]
-            error_message = (
-                'Недопустимые данные. Некоторые теги не найдены: '
-                f'{invalid_tags}.'
-            )
-            raise serializers.ValidationError(error_message)
-        data['tags'] = tags
-        return data
+        read_only_fields = (
+            'author',
+            'favorites_count',
+            'in_carts_count',
+            'image_width',
+            'image_height',
+            'image_variants')
+
+    def to_internal_value(self, data):
+        if html.is_html_input(data):
+            data = self.parse_form(data)
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def parse_form(data):
+        parsed = data.dict()
+        for name in ('ingredients', 'tags'):
+            if name not in data:
+                continue
+            parsed[name] = []
+            for value in data.getlist(name):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    raise serializers.ValidationError(
+                        {name: ['Ожидается JSON.']})
+                if isinstance(value, list):
+                    parsed[name].extend(value)
+                else:
+                    parsed[name].append(value)
+        return parsed
 
     def validate_cooking_time(self, cooking_time):
         if int(cooking_time) < 1:
@@ -215,23 +280,58 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 'Время приготовления >= 1!')
         return cooking_time
 
+    @staticmethod
+    def split_duplicates(ids):
+        unique = set()
+        duplicates = set()
+        for item_id in ids:
+            if item_id in unique:
+                duplicates.add(item_id)
+            unique.add(item_id)
+        return unique, sorted(duplicates)
+
+    @staticmethod
+    def find_missing(model, ids):
+        found = model.objects.filter(id__in=ids).values_list('id', flat=True)
+        return sorted(ids.difference(found))
+
     def validate_ingredients(self, ingredients):
         if not ingredients:
             raise serializers.ValidationError(
                 'Минимум 1 ингредиент должен быть указан.')
-        ingredient_ids = []
-        for ingredient in ingredients:
-            ingredient_id = ingredient.get('id')
-            amount = ingredient.get('amount')
-            if ingredient_id in ingredient_ids:
-                raise serializers.ValidationError(
-                    'Ингредиенты должны быть уникальными.')
-            ingredient_ids.append(ingredient_id)
-            if amount < 1:
-                raise serializers.ValidationError(
-                    'Количество ингредиента должно быть больше или равно 1.')
+        errors = []
+        ingredient_ids, duplicates = self.split_duplicates(
+            ingredient['id'] for ingredient in ingredients)
+        if duplicates:
+            errors.append(
+                f'Ингредиенты должны быть уникальными: {duplicates}.')
+        missing = self.find_missing(Ingredient, ingredient_ids)
+        if missing:
+            errors.append(f'Ингредиенты не найдены: {missing}.')
+        if any(ingredient['amount'] < 1 for ingredient in ingredients):
+            errors.append(
+                'Количество ингредиента должно быть больше или равно 1.')
+        if errors:
+            raise serializers.ValidationError(errors)
         return ingredients
 
+    def validate_tags(self, tags):
+        if not tags:
+            raise serializers.ValidationError(
+                'Нужен хотя бы один тэг для рецепта!')
+        errors = []
+        tag_ids, duplicates = self.split_duplicates(tags)
+        if duplicates:
+            errors.append(f'Теги должны быть уникальными: {duplicates}.')
+        missing = self.find_missing(Tag, tag_ids)
+        if missing:
+            errors.append(
+                'Недопустимые данные. Некоторые теги не найдены: '
+                f'{missing}.')
+        if errors:
+            raise serializers.ValidationError(errors)
+        return tags
+
     def create_ingredients(self, ingredients, recipe):
         ingredient_instances = []
         for ingredient in ingredients:
@@ -251,36 +351,34 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        if recipe.image:
+            schedule_image_processing(recipe)
         return recipe
 
     @transaction.atomic()
     def update(self, instance, validated_data):
+        Recipe.objects.lock([instance.pk])
         if 'ingredients' in validated_data:
-            ingredients = validated_data.pop('ingredients')
-            instance.ingredients.clear()
-            self.create_ingredients(ingredients, instance)
+            deltas = IngredientRecipe.objects.sync(instance, {
+                ingredient['id']: ingredient['amount']
+                for ingredient in validated_data.pop('ingredients')})
+            if deltas:
+                ShoppingCartItem.objects.change_recipe(instance, deltas)
         if 'tags' in validated_data:
-            tag_ids = validated_data.pop('tags')
-            tags = Tag.objects.filter(id__in=tag_ids)
-            instance.tags.set(tags)
+            instance.tags.set(validated_data.pop('tags'))
         return super().update(instance, validated_data)
 
-    def to_representation(self, instance):
-        return RecipeSerializer(
-            instance,
-            context={
-                'request': self.context.get('request')
-            }).data
-
 
-class ShortRecipeSerializer(serializers.ModelSerializer):
+class ShortRecipeSerializer(TimedRepresentationMixin,
+                            serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = 'id', 'name', 'image', 'cooking_time'
         read_only_fields = '__all__',
 
 
-class SubscriptionListSerializer(serializers.ModelSerializer):
+class SubscriptionListSerializer(TimedRepresentationMixin,
+                                 serializers.ModelSerializer):
     id = serializers.IntegerField(source='author.id')
     email = serializers.EmailField(source='author.email')
     username = serializers.CharField(source='author.username')
@@ -288,7 +386,8 @@ class SubscriptionListSerializer(serializers.ModelSerializer):
     last_name = serializers.CharField(source='author.last_name')
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(
+        source='author.recipes_count', read_only=True)
 
     class Meta:
         model = Subscription
@@ -302,6 +401,9 @@ class SubscriptionListSerializer(serializers.ModelSerializer):
                   'recipes_count')
 
     def get_is_subscribed(self, obj):
+        subscriptions = self.context.get('subscriptions')
+        if subscriptions is not None:
+            return obj.author_id in subscriptions
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
             user = request.user
@@ -311,21 +413,16 @@ class SubscriptionListSerializer(serializers.ModelSerializer):
         return False
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = int(request.GET.get('recipes_limit', 0))
-        queryset = Recipe.objects.filter(author=obj.author)
-        if recipes_limit > 0:
-            queryset = queryset[:recipes_limit]
-        return RecipeSerializer(
-            queryset, many=True, context={'request': request}).data
+        recipes = self.context['author_recipes'].get(obj.author_id, [])
+        return ShortRecipeSerializer(
+            recipes, many=True, context=self.context).data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author).count()
 
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation['recipes'] = self.get_recipes(instance)
-        return representation
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100)
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
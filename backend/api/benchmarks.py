@@ -0,0 +1,314 @@
+import base64
+import time
+import tracemalloc
+from itertools import count
+from statistics import median
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingList, Tag
+
+User = get_user_model()
+
+PASSWORD = 'benchmark-password'
+PNG_IMAGES = (
+    base64.b64decode(
+        'iVBORw0KGgoAAAANSUhEUgAAAAIAAAACCAIAAAD91JpzAAAAFklEQVR4nGM8ISfHwMDA'
+        'xMDAwMDAAAANBAEIfXHKZgAAAABJRU5ErkJggg=='),
+    base64.b64decode(
+        'iVBORw0KGgoAAAANSUhEUgAAAAIAAAACCAIAAAD91JpzAAAAFklEQVR4nGOUkzvBwMDA'
+        'xMDAwMDAAAALsAEIJvuBVQAAAABJRU5ErkJggg=='),
+)
+UNBENCHMARKED_ROUTES = {
+    'users-activation',
+    'users-resend-activation',
+    'users-reset-password',
+    'users-reset-password-confirm',
+    'users-reset-username',
+    'users-reset-username-confirm',
+    'users-set-username',
+}
+
+sequence = count()
+
+
+class Scenario:
+
+    def __init__(self, name, route, method, path, data=None, anonymous=False,
+                 setup=None, teardown=None, content_type=None):
+        self.name = name
+        self.route = route
+        self.method = method
+        self.path = path
+        self.data = data
+        self.anonymous = anonymous
+        self.setup = setup
+        self.teardown = teardown
+        self.content_type = content_type
+
+    def prepare(self, client, state):
+        context = dict(state, iteration=next(sequence))
+        if self.setup:
+            context.update(self.setup(client, context))
+        return context
+
+    def request(self, client, context):
+        path = self.path.format(**context)
+        data = self.data(context) if callable(self.data) else self.data
+        if self.content_type:
+            return client.generic(
+                self.method.upper(), path, data,
+                content_type=self.content_type)
+        if self.method == 'get':
+            return client.get(path)
+        return getattr(client, self.method)(path, data, format='json')
+
+    def cleanup(self, client, context, response):
+        if self.teardown:
+            self.teardown(client, context, response)
+
+
+def recipe_payload(state):
+    return {
+        'name': f'Бенчмарк {state["iteration"]}',
+        'text': 'Рецепт для замера производительности.',
+        'cooking_time': 10 + state['iteration'] % 2,
+        'tags': state['tag_ids'],
+        'ingredients': [
+            {'id': ingredient_id, 'amount': 10 + state['iteration'] % 2}
+            for ingredient_id in state['ingredient_ids']],
+    }
+
+
+def user_payload(state):
+    return {
+        'email': f'benchmark{state["iteration"]}@example.com',
+        'username': f'benchmark{state["iteration"]}',
+        'first_name': 'Бенчмарк',
+        'last_name': 'Бенчмарков',
+        'password': PASSWORD,
+    }
+
+
+def create_recipe(client, state):
+    response = client.post('/api/recipes/', recipe_payload(state),
+                           format='json')
+    return {'created': response.json()['id']}
+
+
+def delete_created(model):
+    def teardown(client, state, response):
+        model.objects.filter(pk=response.json()['id']).delete()
+    return teardown
+
+
+def repeat(method, path, data=None):
+    def step(client, state, response=None):
+        getattr(client, method)(
+            path.format(**state), data and data(state), format='json')
+        return {}
+    return step
+
+
+def bulk_recipes(state):
+    return {'recipes': state['bulk_recipe_ids']}
+
+
+SCENARIOS = (
+    Scenario('api-root', 'api-root', 'get', '/api/', anonymous=True),
+    Scenario('users list', 'users-list', 'get', '/api/users/?limit=6',
+             anonymous=True),
+    Scenario('users create', 'users-list', 'post', '/api/users/',
+             data=user_payload, anonymous=True,
+             teardown=delete_created(User)),
+    Scenario('users detail', 'users-detail', 'get', '/api/users/{author}/'),
+    Scenario('users me', 'users-me', 'get', '/api/users/me/'),
+    Scenario('users set_password', 'users-set-password', 'post',
+             '/api/users/set_password/',
+             data={'current_password': PASSWORD, 'new_password': PASSWORD}),
+    Scenario('users subscriptions', 'users-subscriptions', 'get',
+             '/api/users/subscriptions/?limit=6&recipes_limit=3'),
+    Scenario('users subscriptions cursor', 'users-subscriptions', 'get',
+             '/api/users/subscriptions/?limit=6&recipes_limit=3&cursor='),
+    Scenario('users subscribe', 'users-subscribe', 'post',
+             '/api/users/{author}/subscribe/',
+             teardown=repeat('delete', '/api/users/{author}/subscribe/')),
+    Scenario('users unsubscribe', 'users-subscribe', 'delete',
+             '/api/users/{author}/subscribe/',
+             setup=repeat('post', '/api/users/{author}/subscribe/')),
+    Scenario('ingredients list', 'ingredients-list', 'get',
+             '/api/ingredients/', anonymous=True),
+    Scenario('ingredients search', 'ingredients-list', 'get',
+             '/api/ingredients/?name={ingredient_prefix}', anonymous=True),
+    Scenario('ingredients detail', 'ingredients-detail', 'get',
+             '/api/ingredients/{ingredient}/', anonymous=True),
+    Scenario('tags list', 'tags-list', 'get', '/api/tags/', anonymous=True),
+    Scenario('tags detail', 'tags-detail', 'get', '/api/tags/{tag}/',
+             anonymous=True),
+    Scenario('recipes list anonymous', 'recipes-list', 'get',
+             '/api/recipes/?limit=6', anonymous=True),
+    Scenario('recipes list', 'recipes-list', 'get', '/api/recipes/?limit=6'),
+    Scenario('recipes list page', 'recipes-list', 'get',
+             '/api/recipes/?limit=6&page=50'),
+    Scenario('recipes list cursor', 'recipes-list', 'get',
+             '/api/recipes/?limit=6&cursor='),
+    Scenario('recipes list tags', 'recipes-list', 'get',
+             '/api/recipes/?limit=6&tags={tag_slug}&tags={other_tag_slug}'),
+    Scenario('recipes list author', 'recipes-list', 'get',
+             '/api/recipes/?limit=6&author={author}'),
+    Scenario('recipes list favorited', 'recipes-list', 'get',
+             '/api/recipes/?limit=6&is_favorited=1'),
+    Scenario('recipes list shopping cart', 'recipes-list', 'get',
+             '/api/recipes/?limit=6&is_in_shopping_cart=1'),
+    Scenario('recipes list search', 'recipes-list', 'get',
+             '/api/recipes/?limit=6&search=суп'),
+    Scenario('recipes create', 'recipes-list', 'post', '/api/recipes/',
+             data=recipe_payload, teardown=delete_created(Recipe)),
+    Scenario('recipes detail anonymous', 'recipes-detail', 'get',
+             '/api/recipes/{recipe}/', anonymous=True),
+    Scenario('recipes detail', 'recipes-detail', 'get',
+             '/api/recipes/{recipe}/'),
+    Scenario('recipes update', 'recipes-detail', 'patch',
+             '/api/recipes/{own_recipe}/', data=recipe_payload),
+    Scenario('recipes delete', 'recipes-detail', 'delete',
+             '/api/recipes/{created}/', setup=create_recipe),
+    Scenario('recipes image', 'recipes-image', 'put',
+             '/api/recipes/{own_recipe}/image/',
+             data=lambda state: PNG_IMAGES[state['iteration'] % 2],
+             content_type='image/png'),
+    Scenario('recipes favorite', 'recipes-favorite', 'post',
+             '/api/recipes/{recipe}/favorite/',
+             teardown=repeat('delete', '/api/recipes/{recipe}/favorite/')),
+    Scenario('recipes unfavorite', 'recipes-favorite', 'delete',
+             '/api/recipes/{recipe}/favorite/',
+             setup=repeat('post', '/api/recipes/{recipe}/favorite/')),
+    Scenario('recipes shopping cart add', 'recipes-shopping-cart', 'post',
+             '/api/recipes/{recipe}/shopping_cart/',
+             teardown=repeat(
+                 'delete', '/api/recipes/{recipe}/shopping_cart/')),
+    Scenario('recipes shopping cart remove', 'recipes-shopping-cart',
+             'delete', '/api/recipes/{recipe}/shopping_cart/',
+             setup=repeat('post', '/api/recipes/{recipe}/shopping_cart/')),
+    Scenario('recipes favorite bulk', 'recipes-favorite-bulk', 'post',
+             '/api/recipes/favorite/', data=bulk_recipes,
+             teardown=repeat('delete', '/api/recipes/favorite/',
+                             bulk_recipes)),
+    Scenario('recipes shopping cart bulk', 'recipes-shopping-cart-bulk',
+             'post', '/api/recipes/shopping_cart/', data=bulk_recipes,
+             teardown=repeat('delete', '/api/recipes/shopping_cart/',
+                             bulk_recipes)),
+    Scenario('download shopping cart txt', 'recipes-download-shopping-cart',
+             'get', '/api/recipes/download_shopping_cart/?format=txt'),
+    Scenario('download shopping cart pdf', 'recipes-download-shopping-cart',
+             'get', '/api/recipes/download_shopping_cart/?format=pdf'),
+)
+
+
+def prepare_state(client, user):
+    user.set_password(PASSWORD)
+    user.save(update_fields=['password'])
+    authors = list(User.objects.exclude(pk=user.pk).order_by(
+        '-recipes_count').values_list('id', flat=True)[:11])
+    for author in authors[1:]:
+        client.post(f'/api/users/{author}/subscribe/')
+    taken = set(Favorite.objects.filter(user=user).values_list(
+        'recipe_id', flat=True))
+    taken.update(ShoppingList.objects.filter(user=user).values_list(
+        'recipe', flat=True))
+    popular = [
+        recipe_id for recipe_id in Recipe.objects.exclude(
+            author=user).order_by('-favorites_count').values_list(
+            'id', flat=True)[:len(taken) + 40]
+        if recipe_id not in taken]
+    client.post('/api/recipes/favorite/', {'recipes': popular[20:30]},
+                format='json')
+    client.post('/api/recipes/shopping_cart/', {'recipes': popular[20:30]},
+                format='json')
+    tags = list(Tag.objects.annotate(total=Count('recipes')).order_by(
+        '-total')[:2])
+    ingredient = Ingredient.objects.order_by('id').first()
+    state = {
+        'author': authors[0],
+        'recipe': popular[0],
+        'bulk_recipe_ids': popular[1:11],
+        'tag': tags[0].pk,
+        'tag_ids': [tag.pk for tag in tags],
+        'tag_slug': tags[0].slug,
+        'other_tag_slug': tags[-1].slug,
+        'ingredient': ingredient.pk,
+        'ingredient_prefix': ingredient.name[:4],
+        'ingredient_ids': list(Ingredient.objects.order_by(
+            'id').values_list('id', flat=True)[:10]),
+        'iteration': 0,
+    }
+    state.update(create_recipe(client, state))
+    state['own_recipe'] = state.pop('created')
+    return state
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def perform(scenario, client, state):
+    context = scenario.prepare(client, state)
+    if scenario.anonymous:
+        cache.clear()
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        started = time.perf_counter()
+        response = scenario.request(client, context)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise AssertionError(
+            f'{scenario.name}: HTTP {response.status_code} '
+            f'{response.content[:200]!r}')
+    scenario.cleanup(client, context, response)
+    return elapsed, queries.count
+
+
+def measure(scenario, client, state, iterations):
+    perform(scenario, client, state)
+    timings = []
+    queries = 0
+    for _ in range(iterations):
+        elapsed, executed = perform(scenario, client, state)
+        timings.append(elapsed)
+        queries = max(queries, executed)
+    tracemalloc.start()
+    try:
+        perform(scenario, client, state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'queries': queries,
+        'p50_ms': round(median(timings) * 1000, 2),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+        'memory_kb': round(peak / 1024, 1),
+    }
+
+
+def check_budget(result, budget):
+    if budget is None:
+        return ['нет бюджета']
+    return [
+        f'{metric} {result[metric]} > {budget[metric]}'
+        for metric in ('queries', 'p95_ms', 'memory_kb')
+        if result[metric] > budget[metric]]
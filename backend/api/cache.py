@@ -0,0 +1,47 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from recipes.models import ModelVersion
+
+RESPONSE_KEY = 'response:{}:{}'
+RESPONSE_CACHE_LABELS = (
+    'recipes.recipe',
+    'recipes.ingredient',
+    'recipes.tag',
+    'users.user',
+)
+
+
+def get_generations(*labels):
+    versions = dict(ModelVersion.objects.filter(
+        label__in=labels).values_list('label', 'version'))
+    return tuple(versions.get(label, 0) for label in labels)
+
+
+def get_generation(label):
+    return get_generations(label)[0]
+
+
+def cached_response(request, get_response, labels=RESPONSE_CACHE_LABELS):
+    if request.user.is_authenticated or request.method != 'GET':
+        return get_response()
+    params = urlencode(
+        sorted(
+            (key, sorted(values))
+            for key, values in request.query_params.lists()),
+        doseq=True)
+    generations = ':'.join(map(str, get_generations(*labels)))
+    digest = hashlib.md5(
+        f'{request.get_host()}{request.path}?{params}'.encode()).hexdigest()
+    key = RESPONSE_KEY.format(generations, digest)
+    data = cache.get(key)
+    if data is not None:
+        return Response(data)
+    response = get_response()
+    if response.status_code == 200:
+        cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+    return response
@@ -0,0 +1,46 @@
+from functools import partial
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from recipes.models import ModelVersion
+
+
+def conditional_response(request, etag, last_modified, get_response):
+    etag = quote_etag(etag)
+    if last_modified is not None:
+        last_modified = int(last_modified.timestamp())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = get_response()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'no-cache'
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+    return response
+
+
+class TableVersionConditionalMixin:
+
+    def table_version(self):
+        return ModelVersion.objects.for_model(self.queryset.model)
+
+    def table_conditional(self, request, get_response, version=None):
+        if version is None:
+            version = self.table_version()
+        return conditional_response(
+            request,
+            f'{version.label}-{version.version}',
+            version.updated_at,
+            get_response)
+
+    def list(self, request, *args, **kwargs):
+        return self.table_conditional(
+            request, partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.table_conditional(
+            request, partial(super().retrieve, request, *args, **kwargs))
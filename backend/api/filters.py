@@ -1,10 +1,24 @@
+from functools import reduce
+from operator import or_
+
 from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import OuterRef, Q, Subquery, Sum
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Recipe, Tag, Ingredient
+from recipes.models import Recipe, RecipeSearchTerm, Tag, Ingredient
+from recipes.search import tokenize
 
 User = get_user_model()
 
+MAX_CHARACTER = chr(0x10FFFF)
+
+
+def term_prefix(term, vendor):
+    if vendor == 'sqlite':
+        return Q(term__gte=term, term__lt=term + MAX_CHARACTER)
+    return Q(term__startswith=term)
+
 
 class CustomIngredientFilter(FilterSet):
     name_starts_with = filters.CharFilter(
@@ -27,6 +41,7 @@ class CustomRecipeFilter(FilterSet):
         method='is_favorited_filter', lookup_expr='isnull', exclude=True)
     is_in_shopping_cart = filters.BooleanFilter(
         method='shopping_list_filter', lookup_expr='isnull')
+    search = filters.CharFilter(method='search_filter')
 
     class Meta:
         model = Recipe
@@ -42,6 +57,19 @@ class CustomRecipeFilter(FilterSet):
             return queryset.filter(shopping_list__user=self.request.user)
         return queryset
 
+    def search_filter(self, queryset, name, value):
+        terms = set(tokenize(value))
+        if not terms:
+            return queryset
+        vendor = connections[queryset.db].vendor
+        matches = RecipeSearchTerm.objects.filter(reduce(or_, (
+            term_prefix(term, vendor) for term in terms)))
+        rank = matches.filter(recipe=OuterRef('pk')).values(
+            'recipe').annotate(rank=Sum('weight')).values('rank')
+        return queryset.filter(
+            id__in=matches.values('recipe')).annotate(
+            search_rank=Subquery(rank)).order_by('-search_rank', '-id')
+
     class Meta:
         model = Recipe
         fields = ('tags', 'author',)
@@ -0,0 +1,62 @@
+from bisect import bisect_left, bisect_right
+from threading import Lock
+
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._index = ((), (), '', ())
+
+    def _build(self, version):
+        rows = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (row['name'].lower(), row['id']))
+        names = tuple(row['name'].lower() for row in rows)
+        offsets = []
+        position = 0
+        for name in names:
+            offsets.append(position)
+            position += len(name) + 1
+        self._index = (
+            names, tuple(rows), '\n'.join(names), tuple(offsets))
+        self._version = version
+
+    def _refresh(self, version):
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._build(version)
+
+    @staticmethod
+    def _substring_indexes(text, offsets, query):
+        position = text.find(query)
+        while position != -1:
+            index = bisect_right(offsets, position) - 1
+            yield index
+            if index + 1 == len(offsets):
+                break
+            position = text.find(query, offsets[index + 1])
+
+    def search(self, query, version):
+        self._refresh(version)
+        query = query.lower()
+        if not query or '\n' in query:
+            return []
+        names, items, text, offsets = self._index
+        start = bisect_left(names, query)
+        end = start
+        while end < len(names) and names[end].startswith(query):
+            end += 1
+        matches = list(items[start:end])
+        matches.extend(
+            items[index] for index in self._substring_indexes(
+                text, offsets, query)
+            if not start <= index < end)
+        return matches
+
+
+ingredient_index = IngredientIndex()
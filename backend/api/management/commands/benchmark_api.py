@@ -0,0 +1,161 @@
+import json
+import logging
+import math
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from api.benchmarks import (
+    SCENARIOS,
+    UNBENCHMARKED_ROUTES,
+    check_budget,
+    measure,
+    prepare_state,
+)
+from api.router import router_v1
+from api.timing import logger as timing_logger
+
+User = get_user_model()
+
+BUDGETS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    'benchmark_budgets.json')
+LATENCY_HEADROOM = 3
+LATENCY_FLOOR_MS = 25
+MEMORY_HEADROOM = 1.5
+
+
+class Command(BaseCommand):
+    help = ('Замеряет число SQL-запросов, задержку p50/p95 и выделенную '
+            'память для каждого эндпоинта API на синтетических данных '
+            'в SQLite и сверяет их с бюджетами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=300)
+        parser.add_argument('--recipes', type=int, default=3000)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--budgets', default=BUDGETS_PATH)
+        parser.add_argument(
+            '--only',
+            help='Запустить только сценарии, содержащие эту строку.')
+        parser.add_argument(
+            '--update-budgets',
+            action='store_true',
+            help='Записать текущие результаты в файл бюджетов.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                'Бюджеты рассчитаны на SQLite: запустите команду с '
+                'ENGINE=django.db.backends.sqlite3.')
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if not options['only'] or options['only'] in scenario.name]
+        if not options['only']:
+            self.check_coverage()
+        log_level = timing_logger.level
+        timing_logger.setLevel(logging.WARNING)
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(
+                        MEDIA_ROOT=media_root,
+                        IMAGE_PROCESSING_WORKERS=0,
+                        PASSWORD_HASHERS=[
+                            'django.contrib.auth.hashers.MD5PasswordHasher']):
+                    results = self.run_benchmarks(scenarios, options)
+        finally:
+            timing_logger.setLevel(log_level)
+        if options['update_budgets']:
+            self.write_budgets(options['budgets'], results)
+            return
+        self.report(results, self.load_budgets(options['budgets']))
+
+    def check_coverage(self):
+        routes = {url.name for url in router_v1.urls}
+        covered = {scenario.route for scenario in SCENARIOS}
+        missing = routes - covered - UNBENCHMARKED_ROUTES
+        if missing:
+            raise CommandError(
+                f'Нет сценариев для маршрутов: {", ".join(sorted(missing))}')
+
+    def run_benchmarks(self, scenarios, options):
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            cache.clear()
+            call_command(
+                'seed_load_data',
+                users=options['users'],
+                recipes=options['recipes'],
+                seed=42,
+                stdout=StringIO())
+            user = User.objects.order_by('id').first()
+            clients = {True: APIClient(), False: APIClient()}
+            clients[False].force_authenticate(user)
+            state = prepare_state(clients[False], user)
+            results = {}
+            for scenario in scenarios:
+                try:
+                    results[scenario.name] = measure(
+                        scenario,
+                        clients[scenario.anonymous],
+                        state,
+                        options['iterations'])
+                except AssertionError as error:
+                    raise CommandError(str(error))
+            return results
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    @staticmethod
+    def load_budgets(path):
+        try:
+            with open(path, encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            raise CommandError(
+                f'Файл бюджетов {path} не найден, создайте его с '
+                '--update-budgets.')
+
+    def write_budgets(self, path, results):
+        budgets = {
+            name: {
+                'queries': result['queries'],
+                'p95_ms': max(
+                    math.ceil(result['p95_ms'] * LATENCY_HEADROOM),
+                    LATENCY_FLOOR_MS),
+                'memory_kb': math.ceil(
+                    result['memory_kb'] * MEMORY_HEADROOM),
+            }
+            for name, result in results.items()}
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(budgets, file, ensure_ascii=False, indent=2)
+            file.write('\n')
+        self.stdout.write(self.style.SUCCESS(f'Бюджеты записаны в {path}'))
+
+    def report(self, results, budgets):
+        failures = 0
+        for name, result in results.items():
+            problems = check_budget(result, budgets.get(name))
+            line = (
+                f'{name:<32} {result["queries"]:>4} запр. '
+                f'p50 {result["p50_ms"]:>8.2f} мс '
+                f'p95 {result["p95_ms"]:>8.2f} мс '
+                f'{result["memory_kb"]:>9.1f} КБ')
+            if problems:
+                failures += 1
+                self.stdout.write(self.style.ERROR(
+                    f'{line}  {"; ".join(problems)}'))
+            else:
+                self.stdout.write(line)
+        if failures:
+            raise CommandError(f'Превышены бюджеты: {failures}')
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены.'))
@@ -1,29 +1,81 @@
-from rest_framework.pagination import BasePagination
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.pagination import BasePagination, CursorPagination
 from rest_framework.response import Response
 
+from api.cache import get_generation
+from recipes.counters import estimate_count
+
+
+class KeysetPagination(CursorPagination):
+    ordering = '-id'
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        return (getattr(view, 'cursor_ordering', self.ordering),)
+
+    def supports(self, queryset, view):
+        ordering = tuple(queryset.query.order_by)
+        return not ordering or ordering == self.get_ordering(
+            None, queryset, view)
+
 
 class CustomPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_query_params = ('page', 'limit', 'cursor')
+
     def paginate_queryset(self, queryset, request, view=None):
-        recipes_limit = int(request.GET.get('recipes_limit', 0))
-        self.recipes_limit = recipes_limit
+        self.keyset = None
+        if self.cursor_query_param in request.query_params:
+            keyset = KeysetPagination()
+            if keyset.supports(queryset, view):
+                self.keyset = keyset
+                return keyset.paginate_queryset(queryset, request, view)
         page_number = int(request.GET.get('page', 1))
         limit = int(request.GET.get('limit', 10))
         start_index = (page_number - 1) * limit
         end_index = start_index + limit
-        if recipes_limit > 0:
-            queryset = queryset[:recipes_limit]
         self.page_number = page_number
         self.limit = limit
         self.start_index = start_index
         self.end_index = end_index
         self.request = request
-        self.count = queryset.count()
+        self.count, self.count_is_approximate = self.get_count(
+            queryset, request, view)
         return queryset[start_index:end_index]
 
+    def get_count(self, queryset, request, view):
+        estimate = estimate_count(queryset)
+        if estimate is not None:
+            return estimate, True
+        model = getattr(view, 'count_cache_model', None)
+        params = sorted(
+            (key, sorted(values))
+            for key, values in request.query_params.lists()
+            if key not in self.page_query_params)
+        user_params = getattr(view, 'count_cache_user_params', ())
+        if model is None or any(key in user_params for key, _ in params):
+            return queryset.count(), False
+        label = model._meta.label_lower
+        key = 'count:{}:{}:{}:{}'.format(
+            label, get_generation(label), getattr(view, 'action', ''),
+            urlencode(params, doseq=True))
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, settings.COUNT_CACHE_TIMEOUT)
+        return count, False
+
     def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
         return Response({
-            'count': (
-                self.recipes_limit if self.recipes_limit > 0 else self.count),
+            'count': self.count,
+            'count_is_approximate': self.count_is_approximate,
             'results': data,
             'page_number': self.page_number,
             'has_next': self.end_index < self.count,
@@ -0,0 +1,14 @@
+import mimetypes
+
+from rest_framework.parsers import FileUploadParser
+
+
+class ImageUploadParser(FileUploadParser):
+    media_type = 'image/*'
+
+    def get_filename(self, stream, media_type, parser_context):
+        filename = super().get_filename(stream, media_type, parser_context)
+        if filename:
+            return filename
+        extension = mimetypes.guess_extension(media_type.split(';')[0])
+        return 'upload' + (extension or '')
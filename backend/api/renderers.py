@@ -0,0 +1,121 @@
+import csv
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import (
+    BaseRenderer,
+    BrowsableAPIRenderer,
+    JSONRenderer,
+)
+
+from api.timing import TimedRenderMixin
+
+
+class TimedJSONRenderer(TimedRenderMixin, JSONRenderer):
+    pass
+
+
+class TimedBrowsableAPIRenderer(TimedRenderMixin, BrowsableAPIRenderer):
+    pass
+
+
+class ShoppingListRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def format_item(self, item):
+        return (
+            f"{item['ingredient__name']} - "
+            f"{item['total_amount']} "
+            f"{item['ingredient__measurement_unit']}")
+
+    def stream(self, items):
+        return self.stream_lines(self.format_item(item) for item in items)
+
+    def stream_lines(self, lines):
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+        return b''.join(self.stream_lines([str(data)]))
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream_lines(self, lines):
+        separator = ''
+        for line in lines:
+            yield f'{separator}{line}'.encode(self.charset)
+            separator = '\n'
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    header = ('Ингредиент', 'Единица измерения', 'Количество')
+
+    def stream(self, items):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.header).encode(self.charset)
+        for item in items:
+            yield writer.writerow((
+                item['ingredient__name'],
+                item['ingredient__measurement_unit'],
+                item['total_amount'],
+            )).encode(self.charset)
+
+    def stream_lines(self, lines):
+        writer = csv.writer(Echo())
+        for line in lines:
+            yield writer.writerow((line,)).encode(self.charset)
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    margin = 50
+    line_height = 18
+    chunk_size = 64 * 1024
+
+    def get_font(self):
+        if self.font_name in pdfmetrics.getRegisteredFontNames():
+            return self.font_name
+        try:
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_FONT))
+        except (OSError, TTFError):
+            return 'Helvetica'
+        return self.font_name
+
+    def stream_lines(self, lines):
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        font = self.get_font()
+        width, height = A4
+        y = height - self.margin
+        pdf.setFont(font, self.font_size)
+        for line in lines:
+            if y < self.margin:
+                pdf.showPage()
+                pdf.setFont(font, self.font_size)
+                y = height - self.margin
+            pdf.drawString(self.margin, y, line)
+            y -= self.line_height
+        pdf.save()
+        buffer.seek(0)
+        yield from iter(lambda: buffer.read(self.chunk_size), b'')
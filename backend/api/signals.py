@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import ModelVersion, Recipe
+
+User = get_user_model()
+
+
+class PendingBumps:
+
+    def __init__(self):
+        self.models = set()
+
+    def __call__(self):
+        for model in self.models:
+            ModelVersion.objects.bump(model)
+
+
+def bump_on_commit(model):
+    connection = transaction.get_connection()
+    pending = next(
+        (
+            callback for _, callback in connection.run_on_commit
+            if isinstance(callback, PendingBumps)),
+        None)
+    if pending is None:
+        pending = PendingBumps()
+        pending.models.add(model)
+        transaction.on_commit(pending)
+    else:
+        pending.models.add(model)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def model_changed(sender, **kwargs):
+    bump_on_commit(sender)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_on_commit(Recipe)
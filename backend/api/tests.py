@@ -0,0 +1,177 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCartItem,
+    ShoppingList,
+    Subscription,
+    Tag,
+)
+
+User = get_user_model()
+
+RECIPE_LIST_QUERIES = 6
+
+
+class RecipeListQueriesTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@example.com')
+        authors = [
+            User.objects.create(
+                username=f'author{number}',
+                email=f'author{number}@example.com')
+            for number in range(3)]
+        tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag{number}')
+            for number in range(2)]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(3)]
+        shopping_list = ShoppingList.objects.create(user=cls.user)
+        for number in range(10):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10)
+            recipe.tags.set(tags)
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1)
+                for ingredient in ingredients)
+            if number % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            else:
+                shopping_list.recipe.add(recipe)
+        Subscription.objects.create(user=cls.user, author=authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def assert_list_queries(self, limit):
+        cache.clear()
+        with self.assertNumQueries(RECIPE_LIST_QUERIES):
+            response = self.client.get(f'/api/recipes/?limit={limit}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), limit)
+        return response
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        self.assert_list_queries(1)
+        response = self.assert_list_queries(10)
+        flags = {
+            recipe['id']: (
+                recipe['is_favorited'], recipe['is_in_shopping_cart'])
+            for recipe in response.data['results']}
+        self.assertIn((True, False), flags.values())
+        self.assertIn((False, True), flags.values())
+
+
+class ShoppingCartItemsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com')
+        cls.buyers = [
+            User.objects.create(
+                username=f'buyer{number}', email=f'buyer{number}@example.com')
+            for number in range(2)]
+        cls.tag = Tag.objects.create(
+            name='Обед', color='#000000', slug='lunch')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(3)]
+        cls.recipes = []
+        for number in range(2):
+            recipe = Recipe.objects.create(
+                author=cls.author,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10)
+            recipe.tags.set([cls.tag])
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient,
+                    amount=(number + 1) * 10)
+                for ingredient in cls.ingredients[number:number + 2])
+            cls.recipes.append(recipe)
+
+    def request(self, user, method, path, data=None):
+        self.client.force_authenticate(user)
+        return getattr(self.client, method)(path, data, format='json')
+
+    def fill_carts(self):
+        for buyer in self.buyers:
+            for recipe in self.recipes:
+                response = self.request(
+                    buyer, 'post', f'/api/recipes/{recipe.pk}/shopping_cart/')
+                self.assertEqual(response.status_code, 201)
+
+    def assert_cart_matches_recipes(self):
+        expected = Counter()
+        for user_id, ingredient_id, amount in IngredientRecipe.objects.filter(
+                recipe__shopping_list__isnull=False).values_list(
+                'recipe__shopping_list__user', 'ingredient', 'amount'):
+            expected[user_id, ingredient_id] += amount
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingCartItem.objects.values_list(
+                'user', 'ingredient', 'amount')}
+        self.assertEqual(actual, dict(expected))
+
+    def test_add_to_cart(self):
+        self.fill_carts()
+        self.assert_cart_matches_recipes()
+        self.assertEqual(
+            ShoppingCartItem.objects.get(
+                user=self.buyers[0], ingredient=self.ingredients[1]).amount,
+            30)
+
+    def test_edit_recipe_in_cart(self):
+        self.fill_carts()
+        response = self.request(
+            self.author, 'patch', f'/api/recipes/{self.recipes[0].pk}/',
+            {'ingredients': [
+                {'id': self.ingredients[1].pk, 'amount': 5},
+                {'id': self.ingredients[2].pk, 'amount': 7}]})
+        self.assertEqual(response.status_code, 200)
+        self.assert_cart_matches_recipes()
+        self.assertFalse(ShoppingCartItem.objects.filter(
+            ingredient=self.ingredients[0]).exists())
+
+    def test_delete_recipe_in_cart(self):
+        self.fill_carts()
+        response = self.request(
+            self.author, 'delete', f'/api/recipes/{self.recipes[1].pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assert_cart_matches_recipes()
+        self.assertFalse(ShoppingCartItem.objects.filter(
+            ingredient=self.ingredients[2]).exists())
+
+    def test_remove_from_cart(self):
+        self.fill_carts()
+        for recipe in self.recipes:
+            response = self.request(
+                self.buyers[0], 'delete',
+                f'/api/recipes/{recipe.pk}/shopping_cart/')
+            self.assertEqual(response.status_code, 204)
+        self.assert_cart_matches_recipes()
+        self.assertFalse(ShoppingCartItem.objects.filter(
+            user=self.buyers[0]).exists())
@@ -0,0 +1,102 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.durations = {'db': 0.0, 'serialize': 0.0, 'render': 0.0}
+        self.active = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.durations['db'] += time.perf_counter() - started
+
+    def header(self, total):
+        metrics = [
+            f'db;desc="{self.queries} queries";'
+            f'dur={self.durations["db"] * 1000:.1f}',
+            *(
+                f'{name};dur={self.durations[name] * 1000:.1f}'
+                for name in ('serialize', 'render')),
+            f'total;dur={total * 1000:.1f}',
+        ]
+        return ', '.join(metrics)
+
+    def log(self, request, response, total):
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': self.queries,
+            'db_ms': round(self.durations['db'] * 1000, 1),
+            'serialize_ms': round(self.durations['serialize'] * 1000, 1),
+            'render_ms': round(self.durations['render'] * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+        }))
+
+
+@contextmanager
+def track(name):
+    timings = current_timings.get()
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[name] += time.perf_counter() - started
+        timings.active.discard(name)
+
+
+class TimedRepresentationMixin:
+
+    def to_representation(self, instance):
+        with track('serialize'):
+            return super().to_representation(instance)
+
+
+class TimedRenderMixin:
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with track('render'):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+
+
+class ServerTimingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            with connection.execute_wrapper(timings):
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        total = time.perf_counter() - timings.started
+        response['Server-Timing'] = timings.header(total)
+        timings.log(request, response, total)
+        return response
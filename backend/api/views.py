@@ -1,21 +1,30 @@
+from collections import defaultdict
+from functools import partial
 from urllib.parse import unquote
 
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils.functional import SimpleLazyObject
 from django_filters import rest_framework as filters
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
 from djoser.views import UserViewSet
 
+from api.cache import cached_response
+from api.conditional import TableVersionConditionalMixin, conditional_response
 from api.filters import CustomRecipeFilter, CustomIngredientFilter
+from api.ingredients import ingredient_index
 from api.pagination import CustomPagination
+from api.parsers import ImageUploadParser
 from api.Serializers import (
     TagSerializer,
     RecipeSerializer,
@@ -27,24 +36,47 @@ from api.Serializers import (
     RecipeCreateSerializer,
     FavoriteSerializer,
     ShoppingListSerializer,
+    RecipeIdsSerializer,
+    RecipeImageSerializer,
 )
 from api.permissions import IsAdminOrReadOnly, IsOwnerOrReadOnly
+from api.renderers import (
+    ShoppingListCSVRenderer,
+    ShoppingListPDFRenderer,
+    ShoppingListTextRenderer,
+)
 from recipes.models import (
     Recipe,
     Subscription,
     Ingredient,
     Tag,
     ShoppingList,
+    ShoppingCartItem,
     Favorite,
-    IngredientRecipe,
+    ModelVersion,
 )
 
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class SubscriptionsContextMixin:
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        user = self.request.user
+        if user.is_authenticated:
+            context['subscriptions'] = SimpleLazyObject(
+                lambda: set(user.following.values_list(
+                    'author_id', flat=True)))
+        else:
+            context['subscriptions'] = frozenset()
+        return context
+
+
+class CustomUserViewSet(SubscriptionsContextMixin, UserViewSet):
     queryset = User.objects.all().order_by('id')
     pagination_class = CustomPagination
+    cursor_ordering = 'id'
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -85,21 +117,30 @@ class CustomUserViewSet(UserViewSet):
         user = self.request.user
         user.set_password(
             serializer.validated_data['new_password'])
-        user.save()
+        user.save(update_fields=['password'])
         return Response(
             {'detail': 'Пароль успешно изменен'},
             status=status.HTTP_204_NO_CONTENT)
 
     @action(methods=['get'],
             detail=False,
-            permission_classes=[IsAuthenticated]
+            permission_classes=[IsAuthenticated],
+            cursor_ordering='-id'
             )
     def subscriptions(self, request):
         queryset = Subscription.objects.filter(
-            user=request.user)
+            user=request.user).select_related('author').order_by('-id')
         page = self.paginate_queryset(queryset)
+        recipes_limit = int(request.GET.get('recipes_limit', 0))
+        author_recipes = defaultdict(list)
+        for recipe in Recipe.objects.latest_by_author(
+                [subscription.author_id for subscription in page],
+                recipes_limit):
+            author_recipes[recipe.author_id].append(recipe)
+        context = self.get_serializer_context()
+        context['author_recipes'] = author_recipes
         serializer = SubscriptionListSerializer(
-            page, many=True, context={'request': request})
+            page, many=True, context=context)
         return self.get_paginated_response(serializer.data)
 
     @action(methods=['post', 'delete'],
@@ -114,6 +155,8 @@ class CustomUserViewSet(UserViewSet):
             subscription, created = Subscription.objects.get_or_create(
                 author=author, user=user)
             if created:
+                User.objects.filter(pk=author.pk).update(
+                    followers_count=F('followers_count') + 1)
                 return Response(
                     {"message": "Подписка успешно создана."},
                     status=status.HTTP_201_CREATED)
@@ -124,11 +167,13 @@ class CustomUserViewSet(UserViewSet):
             subscription = get_object_or_404(
                 Subscription, author=author, user=user)
             subscription.delete()
+            User.objects.filter(pk=author.pk, followers_count__gt=0).update(
+                followers_count=F('followers_count') - 1)
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(TableVersionConditionalMixin, ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
@@ -136,36 +181,82 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     filterset_class = CustomIngredientFilter
     pagination_class = None
 
-    def get_queryset(self):
-        name = self.request.query_params.get('name')
-        queryset = super().get_queryset()
-
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
         if name:
             if name[0] == '%':
                 name = unquote(name)
-            name = name.lower()
-            queryset = queryset.filter(name__istartswith=name)
-        return queryset
+            version = self.table_version()
+            return self.table_conditional(
+                request,
+                lambda: Response(
+                    ingredient_index.search(name, version.version)),
+                version)
+        return super().list(request, *args, **kwargs)
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(TableVersionConditionalMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SubscriptionsContextMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     pagination_class = CustomPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = CustomRecipeFilter
+    count_cache_model = Recipe
+    count_cache_user_params = ('is_favorited', 'is_in_shopping_cart')
+
+    def get_queryset(self):
+        return Recipe.objects.with_related().with_user_flags(
+            self.request.user)
 
     def get_serializer_class(self):
         if self.action in ['create', 'partial_update']:
             return RecipeCreateSerializer
         return RecipeSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        recipe = get_object_or_404(
+            Recipe.objects.with_user_flags(request.user).values(
+                'updated_at',
+                'author_id',
+                'is_favorited',
+                'is_in_shopping_cart'),
+            pk=kwargs['pk'])
+        is_subscribed = (
+            recipe['author_id'] in self.get_serializer_context()[
+                'subscriptions'])
+        versions = ModelVersion.objects.for_models(Tag, Ingredient, User)
+        last_modified = None
+        if not request.user.is_authenticated:
+            last_modified = max(
+                recipe['updated_at'],
+                *(version.updated_at for version in versions))
+        etag = '-'.join(map(str, (
+            'recipe',
+            kwargs['pk'],
+            recipe['updated_at'].timestamp(),
+            *(version.version for version in versions),
+            int(recipe['is_favorited']),
+            int(recipe['is_in_shopping_cart']),
+            int(is_subscribed))))
+        return conditional_response(
+            request,
+            etag,
+            last_modified,
+            partial(
+                cached_response,
+                request,
+                partial(super().retrieve, request, *args, **kwargs)))
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request, partial(super().list, request, *args, **kwargs))
+
     def perform_create(self, serializer):
         if not self.request.user.is_authenticated:
             raise PermissionDenied('Пользователь не авторизован.')
@@ -177,7 +268,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         elif self.action == 'create':
             permission_classes = [IsAuthenticated]
         else:
-            permission_classes = [AllowAny]
+            return super().get_permissions()
         return [permission() for permission in permission_classes]
 
     def favorites(self, request, *args, **kwargs):
@@ -190,32 +281,78 @@ class RecipeViewSet(viewsets.ModelViewSet):
         try:
             recipe = get_object_or_404(Recipe, id=pk)
             user = request.user
-            if request.method == 'POST':
-                if model == Favorite:
-                    obj, created = model.objects.get_or_create(
-                        user=user, recipe=recipe)
-                elif model == ShoppingList:
-                    obj, created = model.objects.get_or_create(
-                        user=user)
-                    obj.recipe.add(recipe)
-                status_code = status.HTTP_201_CREATED
-            elif request.method == 'DELETE':
-                obj = model.objects.get(
-                    user=user, recipe__id=pk)
-                if model == ShoppingList:
-                    obj.recipe.remove(recipe)
-                    if not obj.recipe.exists():
-                        obj.delete()
-                else:
-                    obj.delete()
-                status_code = status.HTTP_204_NO_CONTENT
-
-            serializer = self.get_serializer(recipe)
+            counter = (
+                'favorites_count' if model == Favorite else 'in_carts_count')
+            with transaction.atomic():
+                Recipe.objects.lock([recipe.pk])
+                self.lock_user(user)
+                if request.method == 'POST':
+                    changed = self.add_recipe(user, model, recipe)
+                    delta = 1
+                    status_code = status.HTTP_201_CREATED
+                elif request.method == 'DELETE':
+                    changed = self.remove_recipe(user, model, recipe)
+                    delta = -1
+                    status_code = status.HTTP_204_NO_CONTENT
+                if changed:
+                    self.update_counter(counter, [recipe.pk], delta)
+
+            serializer = self.get_serializer(
+                self.get_queryset().get(pk=recipe.pk))
             return Response(serializer.data, status=status_code)
 
         except Exception:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
+    @staticmethod
+    def lock_user(user):
+        User.objects.select_for_update().get(pk=user.pk)
+
+    def add_recipe(self, user, model, recipe):
+        if model == Favorite:
+            _, created = model.objects.get_or_create(
+                user=user, recipe=recipe)
+            return created
+        obj, _ = model.objects.get_or_create(user=user)
+        if obj.recipe.filter(pk=recipe.pk).exists():
+            return False
+        obj.recipe.add(recipe)
+        ShoppingCartItem.objects.add_recipes(user, [recipe.pk])
+        return True
+
+    def remove_recipe(self, user, model, recipe):
+        obj = model.objects.get(user=user, recipe__id=recipe.pk)
+        if model == ShoppingList:
+            obj.recipe.remove(recipe)
+            ShoppingCartItem.objects.remove_recipes(user, [recipe.pk])
+            if not obj.recipe.exists():
+                obj.delete()
+        else:
+            obj.delete()
+        return True
+
+    def update_counter(self, counter, recipe_ids, delta):
+        queryset = Recipe.objects.filter(pk__in=recipe_ids)
+        if delta < 0:
+            queryset = queryset.filter(**{f'{counter}__gte': -delta})
+        queryset.update(**{counter: F(counter) + delta})
+
+    @action(methods=['put'],
+            detail=True,
+            permission_classes=[IsAuthenticated, IsOwnerOrReadOnly],
+            parser_classes=[ImageUploadParser, MultiPartParser]
+            )
+    def image(self, request, pk=None):
+        recipe = self.get_object()
+        serializer = RecipeImageSerializer(
+            recipe,
+            data={'image': request.data.get(
+                'image', request.data.get('file'))},
+            context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
     @action(methods=['post', 'delete'],
             detail=True,
             permission_classes=[IsAuthenticated]
@@ -232,39 +369,118 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self.handle_action(
             request, pk, ShoppingList, ShoppingListSerializer)
 
+    def bulk_add(self, user, model, recipe_ids):
+        if model == Favorite:
+            existing = set(Favorite.objects.filter(
+                user=user, recipe_id__in=recipe_ids).values_list(
+                'recipe_id', flat=True))
+            added = recipe_ids - existing
+            Favorite.objects.bulk_create(
+                [Favorite(user=user, recipe_id=pk) for pk in added],
+                ignore_conflicts=True)
+            return added
+        shopping_list, _ = ShoppingList.objects.get_or_create(user=user)
+        through = ShoppingList.recipe.through
+        existing = set(through.objects.filter(
+            shoppinglist__user=user, recipe_id__in=recipe_ids).values_list(
+            'recipe_id', flat=True))
+        added = recipe_ids - existing
+        through.objects.bulk_create(
+            [through(shoppinglist=shopping_list, recipe_id=pk)
+             for pk in added],
+            ignore_conflicts=True)
+        ShoppingCartItem.objects.add_recipes(user, added)
+        return added
+
+    def bulk_remove(self, user, model, recipe_ids):
+        if model == Favorite:
+            favorites = Favorite.objects.filter(
+                user=user, recipe_id__in=recipe_ids)
+            removed = set(favorites.values_list('recipe_id', flat=True))
+            favorites.delete()
+            return removed
+        items = ShoppingList.recipe.through.objects.filter(
+            shoppinglist__user=user, recipe_id__in=recipe_ids)
+        removed = set(items.values_list('recipe_id', flat=True))
+        items.delete()
+        ShoppingCartItem.objects.remove_recipes(user, removed)
+        ShoppingList.objects.filter(user=user, recipe__isnull=True).delete()
+        return removed
+
+    def handle_bulk_action(self, request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(
+            serializer.validated_data['recipes']))
+        with transaction.atomic():
+            found = set(Recipe.objects.lock(recipe_ids))
+            self.lock_user(request.user)
+            if request.method == 'POST':
+                changed = self.bulk_add(request.user, model, found)
+                delta = 1
+                statuses = ('added', 'already_added')
+            else:
+                changed = self.bulk_remove(request.user, model, found)
+                delta = -1
+                statuses = ('removed', 'not_in_list')
+            self.update_counter(
+                'favorites_count' if model == Favorite else 'in_carts_count',
+                changed,
+                delta)
+        return Response([
+            {
+                'id': pk,
+                'status': (
+                    'not_found' if pk not in found
+                    else statuses[0] if pk in changed
+                    else statuses[1]),
+            }
+            for pk in recipe_ids
+        ])
+
+    @action(methods=['post', 'delete'],
+            detail=False,
+            url_path='favorite',
+            url_name='favorite-bulk',
+            permission_classes=[IsAuthenticated]
+            )
+    def favorite_bulk(self, request):
+        return self.handle_bulk_action(request, Favorite)
+
+    @action(methods=['post', 'delete'],
+            detail=False,
+            url_path='shopping_cart',
+            url_name='shopping-cart-bulk',
+            permission_classes=[IsAuthenticated]
+            )
+    def shopping_cart_bulk(self, request):
+        return self.handle_bulk_action(request, ShoppingList)
+
     @action(detail=False,
             methods=['get'],
-            permission_classes=[IsAuthenticated]
+            permission_classes=[IsAuthenticated],
+            renderer_classes=[
+                ShoppingListTextRenderer,
+                ShoppingListCSVRenderer,
+                ShoppingListPDFRenderer,
+            ]
             )
     def download_shopping_cart(self, request):
-        shopping_list = ShoppingList.objects.filter(
-            user=request.user)
-        recipe_ids = shopping_list.values_list(
-            'recipe', flat=True)
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__in=recipe_ids).values(
+        renderer = request.accepted_renderer
+        ingredients = ShoppingCartItem.objects.filter(
+            user=request.user).values(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            total_amount=F('amount')
+        ).order_by(
             'ingredient__name',
             'ingredient__measurement_unit'
-        ).annotate(
-            total_amount=Sum('amount')
-        )
-        ingredients_dict = {}
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['total_amount']
-            if name not in ingredients_dict:
-                ingredients_dict[name] = {
-                    'unit': unit,
-                    'amount': amount
-                }
-            else:
-                ingredients_dict[name]['amount'] += amount
-        content = '\n'.join([
-            f"{name} - {data['amount']} {data['unit']}"
-            for name, data in ingredients_dict.items()
-        ])
-        response = HttpResponse(content, content_type='text/plain')
-        response['Content-Disposition'] = ('attachment;'
-                                           'filename="shopping_list.txt"')
+        ).iterator()
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients), content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"')
         return response
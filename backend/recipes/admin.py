@@ -1,8 +1,16 @@
+from collections import Counter
+
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.hashers import make_password
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.utils.functional import cached_property
 from import_export.admin import ImportExportMixin
 
+from recipes.counters import change_counter, estimate_count
 from recipes.models import (
     Ingredient,
     Recipe,
@@ -10,14 +18,36 @@ from recipes.models import (
     IngredientRecipe,
     Favorite,
     Subscription,
-    ShoppingList
+    ShoppingList,
+    ShoppingCartItem,
 )
 
 User = get_user_model()
 
 
-class CustomUserAdmin(UserAdmin):
-    list_display = ('username', 'first_name', 'last_name', 'is_staff')
+class EstimatedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None:
+            return self.object_list.count()
+        return estimate
+
+
+class FastPaginationMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class CustomUserAdmin(FastPaginationMixin, UserAdmin):
+    list_display = (
+        'username',
+        'first_name',
+        'last_name',
+        'is_staff',
+        'recipes_count',
+        'followers_count')
     list_filter = ('is_staff', 'is_superuser')
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
@@ -43,47 +73,154 @@ class CustomUserAdmin(UserAdmin):
     unblock_users.short_description = "Разблокировать пользователя"
 
     def reset_passwords(self, request, queryset):
-        for user in queryset:
-            user.set_unusable_password()
-            user.save()
+        queryset.update(password=make_password(None))
     reset_passwords.short_description = "Сбросить пароль пользователя"
 
 
 class IngredientRecipeInline(admin.TabularInline):
     model = IngredientRecipe
+    autocomplete_fields = ('ingredient',)
 
 
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(FastPaginationMixin, admin.ModelAdmin):
     list_display = ('name', 'author', 'cooking_time', 'get_favorite_count')
-    list_filter = ('author__email', 'author__first_name')
+    list_select_related = ('author',)
+    list_filter = ('tags',)
     search_fields = ('name', 'author__email', 'author__first_name')
+    raw_id_fields = ('author',)
     inlines = [IngredientRecipeInline]
+    exclude = ('ingredients',)
+    readonly_fields = ('favorites_count', 'in_carts_count')
+
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        deltas = Counter()
+        deltas.subtract(IngredientRecipe.objects.totals([recipe.pk]))
+        super().save_related(request, form, formsets, change)
+        deltas.update(IngredientRecipe.objects.totals([recipe.pk]))
+        ShoppingCartItem.objects.change_recipe(recipe, deltas)
 
     def get_favorite_count(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     get_favorite_count.short_description = 'Число добавлений в избранное'
+    get_favorite_count.admin_order_field = 'favorites_count'
 
 
-class IngredientAdmin(ImportExportMixin, admin.ModelAdmin):
+class IngredientAdmin(
+        FastPaginationMixin, ImportExportMixin, admin.ModelAdmin):
     list_display = ('name', 'measurement_unit')
+    search_fields = ('name',)
 
 
 class TagAdmin(admin.ModelAdmin):
     list_display = ('name', 'color', 'slug')
 
 
-class FavoriteAdmin(admin.ModelAdmin):
+class CountedRelationMixin:
+    counted_model = None
+    counted_field = None
+    counter = None
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None:
+            return self.raw_id_fields
+        return ()
+
+    def change_counter(self, target_ids, delta):
+        amounts = Counter()
+        for target_id in target_ids:
+            amounts[target_id] += delta
+        change_counter(self.counted_model, self.counter, amounts)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            self.change_counter(
+                [getattr(obj, f'{self.counted_field}_id')], 1)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            self.change_counter(
+                [getattr(obj, f'{self.counted_field}_id')], -1)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            self.change_counter(
+                queryset.values_list(f'{self.counted_field}_id', flat=True),
+                -1)
+            super().delete_queryset(request, queryset)
+
+
+class FavoriteAdmin(
+        FastPaginationMixin, CountedRelationMixin, admin.ModelAdmin):
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe__author')
+    raw_id_fields = ('user', 'recipe')
+    counted_model = Recipe
+    counted_field = 'recipe'
+    counter = 'favorites_count'
 
 
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(
+        FastPaginationMixin, CountedRelationMixin, admin.ModelAdmin):
     list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    counted_model = User
+    counted_field = 'author'
+    counter = 'followers_count'
 
 
-class ShoppingListAdmin(admin.ModelAdmin):
+class ShoppingListAdmin(FastPaginationMixin, admin.ModelAdmin):
     list_display = ('user_email', 'get_recipe_names')
+    list_select_related = ('user',)
     search_fields = ('user__email',)
+    raw_id_fields = ('user', 'recipe')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('recipe', queryset=Recipe.objects.only('id', 'name')))
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None:
+            return ('user',)
+        return ()
+
+    @staticmethod
+    def recipe_ids(shopping_list):
+        return set(shopping_list.recipe.values_list('id', flat=True))
+
+    @staticmethod
+    def change_cart(user, added, removed):
+        Recipe.objects.lock(added | removed)
+        ShoppingCartItem.objects.add_recipes(user, added)
+        ShoppingCartItem.objects.remove_recipes(user, removed)
+        Recipe.objects.filter(pk__in=added).update(
+            in_carts_count=F('in_carts_count') + 1)
+        Recipe.objects.filter(pk__in=removed, in_carts_count__gt=0).update(
+            in_carts_count=F('in_carts_count') - 1)
+
+    def save_related(self, request, form, formsets, change):
+        shopping_list = form.instance
+        before = self.recipe_ids(shopping_list)
+        super().save_related(request, form, formsets, change)
+        after = self.recipe_ids(shopping_list)
+        self.change_cart(shopping_list.user, after - before, before - after)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            self.change_cart(obj.user, set(), self.recipe_ids(obj))
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for shopping_list in queryset.select_related('user'):
+                self.change_cart(
+                    shopping_list.user, set(),
+                    self.recipe_ids(shopping_list))
+            super().delete_queryset(request, queryset)
 
     def user_email(self, obj):
         return obj.user.email
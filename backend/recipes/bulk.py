@@ -0,0 +1,97 @@
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from recipes.counters import reconcile_counters
+from recipes.models import ModelVersion, RecipeSearchTerm
+from recipes.search import recipe_terms
+
+INSERT_PAGE_SIZE = 1000
+
+
+def insert_sql(model, columns):
+    quote_name = connection.ops.quote_name
+    return 'INSERT INTO {} ({})'.format(
+        quote_name(model._meta.db_table),
+        ', '.join(quote_name(column) for column in columns))
+
+
+def execute_insert(cursor, sql, rows, returning=None):
+    if connection.vendor == 'postgresql':
+        from psycopg2.extras import execute_values
+        if returning:
+            sql += ' VALUES %s RETURNING ' + connection.ops.quote_name(
+                returning)
+        else:
+            sql += ' VALUES %s'
+        return execute_values(
+            cursor.cursor, sql, rows, page_size=INSERT_PAGE_SIZE,
+            fetch=bool(returning))
+    placeholders = ', '.join(['%s'] * len(rows[0])) if rows else ''
+    cursor.executemany(f'{sql} VALUES ({placeholders})', rows)
+    return None
+
+
+def insert_rows(model, fields, rows):
+    if not rows:
+        return
+    sql = insert_sql(
+        model, [model._meta.get_field(field).column for field in fields])
+    with transaction.atomic(), connection.cursor() as cursor:
+        execute_insert(cursor, sql, rows)
+
+
+def prepare_value(obj, field, now):
+    value = getattr(obj, field.attname)
+    if value is None and (
+            getattr(field, 'auto_now', False)
+            or getattr(field, 'auto_now_add', False)):
+        value = now
+        setattr(obj, field.attname, value)
+    return field.get_db_prep_save(value, connection)
+
+
+def bulk_insert(model, objects):
+    if not objects:
+        return objects
+    pk = model._meta.pk
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key]
+    now = timezone.now()
+    rows = [
+        [prepare_value(obj, field, now) for field in fields]
+        for obj in objects]
+    columns = [field.column for field in fields]
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            pks = [
+                value for value, in execute_insert(
+                    cursor, insert_sql(model, columns), rows,
+                    returning=pk.column)]
+        else:
+            last = model._default_manager.aggregate(
+                last=Max('pk'))['last'] or 0
+            pks = range(last + 1, last + len(objects) + 1)
+            for row, value in zip(rows, pks):
+                row.append(value)
+            execute_insert(
+                cursor, insert_sql(model, columns + [pk.column]), rows)
+    for obj, value in zip(objects, pks):
+        setattr(obj, pk.attname, value)
+        obj._state.adding = False
+        obj._state.db = connection.alias
+    return objects
+
+
+def index_recipes(recipes):
+    insert_rows(RecipeSearchTerm, ('recipe', 'term', 'weight'), [
+        (recipe.pk, term, weight)
+        for recipe in recipes
+        for term, weight in recipe_terms(recipe.name, recipe.text).items()])
+
+
+def finish_bulk_load(*models):
+    reconcile_counters()
+    for model in models:
+        ModelVersion.objects.bump(model)
@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def estimate_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.has_filters():
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE relname = %s',
+            [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    if row is None or row[0] < settings.APPROXIMATE_COUNT_THRESHOLD:
+        return None
+    return int(row[0])
+
+
+def get_counters(apps=global_apps):
+    recipe = apps.get_model('recipes', 'Recipe')
+    favorite = apps.get_model('recipes', 'Favorite')
+    shopping_list = apps.get_model('recipes', 'ShoppingList')
+    subscription = apps.get_model('recipes', 'Subscription')
+    user = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    return (
+        (recipe, 'favorites_count', favorite, 'recipe'),
+        (recipe, 'in_carts_count', shopping_list.recipe.through, 'recipe'),
+        (user, 'recipes_count', recipe, 'author'),
+        (user, 'followers_count', subscription, 'author'),
+    )
+
+
+def actual_count(related_model, field):
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(**{field: OuterRef('pk')}).order_by(
+            ).values(field).annotate(total=Count('pk')).values('total')),
+        Value(0))
+
+
+def change_counter(model, counter, amounts):
+    ids_by_amount = defaultdict(list)
+    for pk, amount in amounts.items():
+        if amount:
+            ids_by_amount[amount].append(pk)
+    for amount, ids in ids_by_amount.items():
+        model.objects.filter(pk__in=ids).update(
+            **{counter: Greatest(F(counter) + amount, 0)})
+
+
+def reconcile_counters(apps=global_apps):
+    fixed = {}
+    for model, counter, related_model, field in get_counters(apps):
+        actual = actual_count(related_model, field)
+        drifted = model.objects.annotate(actual=actual).exclude(
+            **{counter: F('actual')})
+        fixed[f'{model._meta.label}.{counter}'] = model.objects.filter(
+            pk__in=drifted.values('pk')).update(**{counter: actual})
+    return fixed
+
+
+def rebuild_shopping_cart_items(apps=global_apps, batch_size=1000):
+    ingredient_recipe = apps.get_model('recipes', 'IngredientRecipe')
+    shopping_cart_item = apps.get_model('recipes', 'ShoppingCartItem')
+    shopping_cart_item.objects.all().delete()
+    totals = ingredient_recipe.objects.filter(
+        recipe__shopping_list__isnull=False).values_list(
+        'recipe__shopping_list__user', 'ingredient').annotate(
+        total=Sum('amount')).order_by()
+    created = shopping_cart_item.objects.bulk_create(
+        (
+            shopping_cart_item(
+                user_id=user_id, ingredient_id=ingredient_id, amount=total)
+            for user_id, ingredient_id, total in totals.iterator()
+        ),
+        batch_size=batch_size)
+    return len(created)
@@ -0,0 +1,157 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from recipes.storage import recipe_image_storage
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('avif', 'AVIF', {'quality': 60}),
+    ('jpeg', 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+)
+
+OPAQUE_FORMATS = {'JPEG'}
+ORIGINAL_FORMATS = {'MPO': 'JPEG'}
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix='recipe-images')
+    return _executor
+
+
+def available_formats():
+    Image.init()
+    return [
+        (extension, pil_format, options)
+        for extension, pil_format, options in VARIANT_FORMATS
+        if pil_format in Image.SAVE]
+
+
+def has_metadata(image):
+    return any(key in image.info for key in METADATA_KEYS) or bool(
+        image.getexif())
+
+
+def strip_metadata(file):
+    file.seek(0)
+    with Image.open(file) as image:
+        source_format = image.format
+        pil_format = ORIGINAL_FORMATS.get(source_format, source_format)
+        if pil_format not in Image.SAVE:
+            pil_format = 'PNG'
+        options = {}
+        if 'icc_profile' in image.info:
+            options['icc_profile'] = image.info['icc_profile']
+        if source_format == 'JPEG':
+            options.update(quality='keep', subsampling='keep')
+        elif pil_format == 'JPEG':
+            options['quality'] = 90
+        ImageOps.exif_transpose(image, in_place=True)
+        for key in METADATA_KEYS:
+            image.info.pop(key, None)
+        buffer = BytesIO()
+        image.save(buffer, pil_format, **options)
+    name = os.path.basename(file.name)
+    if pil_format != source_format:
+        name = f'{os.path.splitext(name)[0]}.{pil_format.lower()}'
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+def flatten(image):
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def normalize_mode(image):
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    if image.mode in ('LA', 'PA') or 'transparency' in image.info:
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def build_variants(image):
+    variants = {}
+    widths = [
+        width for width in settings.IMAGE_VARIANT_WIDTHS
+        if width < image.width] or [image.width]
+    for width in widths:
+        resized = image.copy()
+        resized.thumbnail((width, width * image.height // image.width))
+        for extension, pil_format, options in available_formats():
+            buffer = BytesIO()
+            encoded = (
+                flatten(resized) if pil_format in OPAQUE_FORMATS
+                else resized)
+            encoded.save(buffer, pil_format, **options)
+            variant_name = recipe_image_storage.save(
+                f'recipes/variants/{width}.{extension}',
+                ContentFile(buffer.getvalue()))
+            variants.setdefault(extension, {})[str(width)] = variant_name
+    return variants
+
+
+def process_recipe_image(recipe_id):
+    from recipes.models import Recipe
+
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return
+    name = recipe.image.name
+    stripped = None
+    with recipe.image.open('rb') as file:
+        image = Image.open(file)
+        if has_metadata(image):
+            stripped = strip_metadata(file)
+        image = normalize_mode(ImageOps.exif_transpose(image))
+    variants = build_variants(image)
+    update_fields = [
+        'image_width', 'image_height', 'image_variants', 'updated_at']
+    with transaction.atomic():
+        recipe = Recipe.objects.select_for_update().filter(
+            pk=recipe_id, image=name).first()
+        if recipe is None:
+            return
+        if stripped is not None:
+            recipe.image.save(stripped.name, stripped, save=False)
+            update_fields.append('image')
+        recipe.image_width, recipe.image_height = image.size
+        recipe.image_variants = variants
+        recipe.save(update_fields=update_fields)
+
+
+def run_image_task(recipe_id):
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        logger.exception('Не удалось обработать изображение рецепта %s',
+                         recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_image_processing(recipe):
+    recipe_id = recipe.pk
+    if settings.IMAGE_PROCESSING_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(run_image_task, recipe_id))
+    else:
+        transaction.on_commit(lambda: process_recipe_image(recipe_id))
@@ -0,0 +1,91 @@
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Удаляет из MEDIA_ROOT файлы, на которые не ссылается '
+            'ни одна запись.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать файлы, которые будут удалены.')
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help='Не трогать файлы моложе указанного числа секунд.')
+        parser.add_argument(
+            '--rehash',
+            action='store_true',
+            help='Перенести старые изображения рецептов в хранилище '
+                 'с именами по содержимому.')
+
+    def handle(self, *args, **options):
+        if options['rehash']:
+            self.rehash_images()
+        referenced = self.mark()
+        removed, freed = self.sweep(
+            referenced, time.time() - options['min_age'], options['dry_run'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {removed}, освобождено байт: {freed}'))
+
+    def rehash_images(self):
+        field = Recipe._meta.get_field('image')
+        recipes = Recipe.objects.exclude(image='').exclude(
+            image__isnull=True).exclude(image__startswith=field.upload_to)
+        for recipe in recipes.iterator():
+            try:
+                with recipe.image.open('rb') as file:
+                    recipe.image.save(
+                        os.path.basename(file.name), File(file), save=False)
+            except FileNotFoundError:
+                self.stderr.write(f'Файл не найден: {recipe.image.name}')
+                continue
+            recipe.save(update_fields=['image', 'updated_at'])
+
+    def mark(self):
+        referenced = set()
+        for model in apps.get_models():
+            fields = [
+                field.name for field in model._meta.concrete_fields
+                if isinstance(field, models.FileField)]
+            if fields:
+                for names in model._default_manager.values_list(
+                        *fields).iterator():
+                    referenced.update(name for name in names if name)
+        variants = Recipe.objects.exclude(image_variants={}).values_list(
+            'image_variants', flat=True)
+        for recipe_variants in variants.iterator():
+            for widths in recipe_variants.values():
+                referenced.update(widths.values())
+        return referenced
+
+    def sweep(self, referenced, cutoff, dry_run):
+        removed = freed = 0
+        for root, _, files in os.walk(settings.MEDIA_ROOT, topdown=False):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, settings.MEDIA_ROOT).replace(
+                    os.sep, '/')
+                stat = os.stat(path)
+                if name in referenced or stat.st_mtime > cutoff:
+                    continue
+                self.stdout.write(name)
+                removed += 1
+                freed += stat.st_size
+                if not dry_run:
+                    os.remove(path)
+            if (not dry_run and root != settings.MEDIA_ROOT
+                    and not os.listdir(root)):
+                os.rmdir(root)
+        return removed, freed
@@ -0,0 +1,105 @@
+import json
+import sys
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef
+
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+
+User = get_user_model()
+
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit')
+USER_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name')
+RECIPE_FIELDS = (
+    'id',
+    'author',
+    'name',
+    'text',
+    'cooking_time',
+    'pub_date',
+    'image',
+    'image_width',
+    'image_height',
+    'image_variants',
+)
+
+
+class Command(BaseCommand):
+    help = ('Выгружает рецепты вместе с авторами, тегами и ингредиентами '
+            'в файл NDJSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            nargs='?',
+            default='-',
+            help='Файл для выгрузки, по умолчанию stdout.')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Количество строк, читаемых из базы за один запрос.')
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+        started = time.monotonic()
+        output = (
+            nullcontext(sys.stdout) if options['output'] == '-'
+            else open(options['output'], 'w', encoding='utf-8'))
+        with output as file:
+            self.file = file
+            self.written = 0
+            self.export_rows('tag', Tag.objects.values(*TAG_FIELDS))
+            self.export_rows(
+                'ingredient', Ingredient.objects.values(*INGREDIENT_FIELDS))
+            self.export_rows(
+                'user',
+                User.objects.filter(Exists(Recipe.objects.filter(
+                    author=OuterRef('pk')))).values(*USER_FIELDS))
+            self.export_recipes()
+        elapsed = time.monotonic() - started
+        self.stderr.write(
+            f'Выгружено записей: {self.written} за {elapsed:.2f} с')
+
+    def write(self, record_type, record):
+        self.file.write(json.dumps(
+            {'type': record_type, **record},
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False))
+        self.file.write('\n')
+        self.written += 1
+
+    def export_rows(self, record_type, queryset):
+        for row in queryset.order_by('id').iterator(
+                chunk_size=self.chunk_size):
+            self.write(record_type, row)
+
+    def export_recipes(self):
+        rows = Recipe.objects.order_by('id').values(*RECIPE_FIELDS).iterator(
+            chunk_size=self.chunk_size)
+        chunk = list(islice(rows, self.chunk_size))
+        while chunk:
+            recipe_ids = [row['id'] for row in chunk]
+            tags = defaultdict(list)
+            for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+                    recipe_id__in=recipe_ids).values_list(
+                    'recipe_id', 'tag_id'):
+                tags[recipe_id].append(tag_id)
+            ingredients = defaultdict(list)
+            for recipe_id, ingredient_id, amount in (
+                    IngredientRecipe.objects.filter(
+                        recipe_id__in=recipe_ids).values_list(
+                        'recipe_id', 'ingredient_id', 'amount')):
+                ingredients[recipe_id].append([ingredient_id, amount])
+            for row in chunk:
+                row['tags'] = tags[row['id']]
+                row['ingredients'] = ingredients[row['id']]
+                self.write('recipe', row)
+            chunk = list(islice(rows, self.chunk_size))
@@ -0,0 +1,158 @@
+import json
+import sys
+import time
+from contextlib import nullcontext
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes.bulk import (
+    bulk_insert,
+    finish_bulk_load,
+    index_recipes,
+    insert_rows,
+)
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Загружает рецепты из NDJSON, созданного командой export_recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input',
+            nargs='?',
+            default='-',
+            help='Файл выгрузки, по умолчанию stdin.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество записей в одной транзакции.')
+
+    def handle(self, *args, **options):
+        self.ids = {'tag': {}, 'ingredient': {}, 'user': {}}
+        loaders = {
+            'tag': self.load_tags,
+            'ingredient': self.load_ingredients,
+            'user': self.load_users,
+            'recipe': self.load_recipes,
+        }
+        started = time.monotonic()
+        source = (
+            nullcontext(sys.stdin) if options['input'] == '-'
+            else open(options['input'], encoding='utf-8'))
+        current_type = None
+        batch = []
+        read = 0
+        with source as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                record_type = record.pop('type', None)
+                if record_type not in loaders:
+                    raise CommandError(
+                        f'Неизвестный тип записи: {record_type}')
+                if batch and (record_type != current_type
+                              or len(batch) >= options['batch_size']):
+                    self.flush(loaders[current_type], batch)
+                    batch = []
+                current_type = record_type
+                batch.append(record)
+                read += 1
+        if batch:
+            self.flush(loaders[current_type], batch)
+        finish_bulk_load(Tag, Ingredient, User, Recipe, IngredientRecipe)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено записей: {read} за {elapsed:.2f} с '
+            f'({read / max(elapsed, 1e-6):.0f} записей/с)'))
+
+    @staticmethod
+    def flush(loader, batch):
+        with transaction.atomic():
+            loader(batch)
+
+    def remap(self, record_type, old_id):
+        try:
+            return self.ids[record_type][old_id]
+        except KeyError:
+            raise CommandError(
+                f'Запись {record_type} с id {old_id} не найдена в выгрузке.')
+
+    def load_tags(self, rows):
+        existing = dict(Tag.objects.filter(
+            slug__in=[row['slug'] for row in rows]).values_list('slug', 'id'))
+        created = bulk_insert(Tag, [
+            Tag(name=row['name'], color=row['color'], slug=row['slug'])
+            for row in rows if row['slug'] not in existing])
+        existing.update((tag.slug, tag.pk) for tag in created)
+        for row in rows:
+            self.ids['tag'][row['id']] = existing[row['slug']]
+
+    def load_ingredients(self, rows):
+        existing = {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in Ingredient.objects.filter(
+                name__in=[row['name'] for row in rows]).values_list(
+                'id', 'name', 'measurement_unit')}
+        created = bulk_insert(Ingredient, [
+            Ingredient(
+                name=row['name'], measurement_unit=row['measurement_unit'])
+            for row in rows
+            if (row['name'], row['measurement_unit']) not in existing])
+        existing.update(
+            ((ingredient.name, ingredient.measurement_unit), ingredient.pk)
+            for ingredient in created)
+        for row in rows:
+            self.ids['ingredient'][row['id']] = existing[
+                row['name'], row['measurement_unit']]
+
+    def load_users(self, rows):
+        existing = dict(User.objects.filter(
+            email__in=[row['email'] for row in rows]).values_list(
+            'email', 'id'))
+        password = make_password(None)
+        created = bulk_insert(User, [
+            User(
+                email=row['email'],
+                username=row['username'],
+                first_name=row['first_name'],
+                last_name=row['last_name'],
+                password=password)
+            for row in rows if row['email'] not in existing])
+        existing.update((user.email, user.pk) for user in created)
+        for row in rows:
+            self.ids['user'][row['id']] = existing[row['email']]
+
+    def load_recipes(self, rows):
+        recipes = bulk_insert(
+            Recipe,
+            [
+                Recipe(
+                    author_id=self.remap('user', row['author']),
+                    name=row['name'],
+                    text=row['text'],
+                    cooking_time=row['cooking_time'],
+                    pub_date=parse_datetime(row['pub_date']),
+                    image=row['image'] or '',
+                    image_width=row['image_width'],
+                    image_height=row['image_height'],
+                    image_variants=row['image_variants'])
+                for row in rows
+            ])
+        insert_rows(Recipe.tags.through, ('recipe', 'tag'), [
+            (recipe.pk, self.remap('tag', tag_id))
+            for recipe, row in zip(recipes, rows)
+            for tag_id in row['tags']])
+        insert_rows(IngredientRecipe, ('recipe', 'ingredient', 'amount'), [
+            (recipe.pk, self.remap('ingredient', ingredient_id), amount)
+            for recipe, row in zip(recipes, rows)
+            for ingredient_id, amount in row['ingredients']])
+        index_recipes(recipes)
@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import Ingredient, ModelVersion
+
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    for chunk in iter(lambda: file.read(JSON_CHUNK_SIZE), ''):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            position = skip_separators(buffer, position)
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                break
+            if not isinstance(item, dict):
+                raise CommandError(f'Ожидался объект ингредиента: {item!r}')
+            yield item.get('name', ''), item.get('measurement_unit', '')
+    if skip_separators(buffer, position) < len(buffer):
+        raise CommandError('Файл не является корректным JSON.')
+
+
+def skip_separators(buffer, position):
+    while position < len(buffer) and buffer[position] in '[], \t\r\n':
+        position += 1
+    return position
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+def clean_rows(rows, max_length):
+    for name, measurement_unit in rows:
+        name = name.strip()
+        measurement_unit = measurement_unit.strip()
+        if (name and measurement_unit and len(name) <= max_length
+                and len(measurement_unit) <= max_length):
+            yield name, measurement_unit
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    batch = list(islice(rows, size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, size))
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV или JSON файла.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к ingredients.csv или .json.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество строк в одной транзакции.')
+
+    def handle(self, *args, **options):
+        extension = os.path.splitext(options['path'])[1].lower()
+        if extension not in READERS:
+            raise CommandError('Поддерживаются только файлы .csv и .json.')
+        max_length = Ingredient._meta.get_field('name').max_length
+        load_batch = (
+            self.copy_batch if connection.vendor == 'postgresql'
+            else self.insert_batch)
+        before = Ingredient.objects.count()
+        started = time.monotonic()
+        read = 0
+        with open(options['path'], encoding='utf-8') as file:
+            rows = clean_rows(READERS[extension](file), max_length)
+            for batch in batches(rows, options['batch_size']):
+                with transaction.atomic():
+                    load_batch(batch)
+                read += len(batch)
+        elapsed = time.monotonic() - started
+        created = Ingredient.objects.count() - before
+        if created:
+            ModelVersion.objects.bump(Ingredient)
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано строк: {read}, добавлено: {created}, '
+            f'за {elapsed:.2f} с ({read / max(elapsed, 1e-6):.0f} строк/с)'))
+
+    @staticmethod
+    def insert_batch(batch):
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in batch
+            ],
+            ignore_conflicts=True)
+
+    @staticmethod
+    def copy_batch(batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_load '
+                '(name text, measurement_unit text) ON COMMIT DROP')
+            cursor.copy_expert(
+                'COPY ingredient_load FROM STDIN WITH (FORMAT csv)', buffer)
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_load '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING')
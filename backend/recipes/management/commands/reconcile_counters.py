@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import rebuild_shopping_cart_items, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики рецептов и пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shopping-cart',
+            action='store_true',
+            help='Также пересобрать таблицу ингредиентов списков покупок.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = reconcile_counters()
+            if options['shopping_cart']:
+                rebuilt = rebuild_shopping_cart_items()
+        for counter, rows in fixed.items():
+            self.stdout.write(f'{counter}: исправлено {rows}')
+        if options['shopping_cart']:
+            self.stdout.write(
+                f'Ингредиентов в списках покупок: {rebuilt}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
@@ -0,0 +1,247 @@
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from recipes.bulk import (
+    bulk_insert,
+    finish_bulk_load,
+    index_recipes,
+    insert_rows,
+)
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCartItem,
+    ShoppingList,
+    Subscription,
+    Tag,
+)
+
+User = get_user_model()
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'стакан')
+WORDS = (
+    'борщ', 'суп', 'салат', 'пирог', 'каша', 'омлет', 'рагу', 'плов',
+    'котлеты', 'блины', 'запеканка', 'гуляш', 'курица', 'говядина',
+    'рыба', 'грибы', 'сыр', 'томаты', 'картофель', 'капуста', 'свекла',
+    'морковь', 'лук', 'чеснок', 'укроп', 'сметана', 'тесто', 'ягоды',
+    'яблоки', 'мёд', 'острый', 'домашний', 'быстрый', 'летний', 'постный',
+    'сытный', 'нежный', 'запечённый', 'тушёный', 'жареный',
+)
+INGREDIENTS_PER_RECIPE = (5, 30)
+MAX_AMOUNT = 500
+MAX_COOKING_TIME = 240
+PUB_DATE_SPREAD_DAYS = 3 * 365
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными для нагрузочного '
+            'тестирования.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=2000,
+            help='Сколько ингредиентов создать, если таблица пуста.')
+        parser.add_argument(
+            '--favorites',
+            type=float,
+            default=20,
+            help='Среднее число избранных рецептов у пользователя.')
+        parser.add_argument(
+            '--subscriptions',
+            type=float,
+            default=5,
+            help='Среднее число подписок у пользователя.')
+        parser.add_argument(
+            '--cart',
+            type=float,
+            default=3,
+            help='Среднее число рецептов в списке покупок.')
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.2,
+            help='Показатель степенного распределения популярности.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.alpha = options['alpha']
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+        tag_ids = self.ensure_tags()
+        ingredient_ids = self.ensure_ingredients(options['ingredients'])
+        user_ids = self.create_users(options['users'])
+        recipe_ids = self.create_recipes(
+            options['recipes'], user_ids, tag_ids, ingredient_ids)
+        self.create_favorites(user_ids, recipe_ids, options['favorites'])
+        self.create_subscriptions(user_ids, options['subscriptions'])
+        self.create_shopping_lists(user_ids, recipe_ids, options['cart'])
+        finish_bulk_load(Tag, Ingredient, User, Recipe, IngredientRecipe)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)} за {elapsed:.1f} с'))
+
+    def popularity(self, ids):
+        ranked = list(ids)
+        self.random.shuffle(ranked)
+        return ranked, list(accumulate(
+            1 / (rank ** self.alpha) for rank in range(1, len(ranked) + 1)))
+
+    def pick(self, population, mean, exclude=None):
+        ids, cum_weights = population
+        count = min(int(self.random.expovariate(1 / mean)), len(ids))
+        picked = set(self.random.choices(ids, cum_weights=cum_weights,
+                                         k=count))
+        picked.discard(exclude)
+        return picked
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def words(self, low, high):
+        return ' '.join(self.random.choices(
+            WORDS, k=self.random.randint(low, high)))
+
+    def ensure_tags(self):
+        existing = set(Tag.objects.values_list('slug', flat=True))
+        bulk_insert(Tag, [
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in TAGS if slug not in existing])
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def ensure_ingredients(self, total):
+        if not Ingredient.objects.exists():
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(
+                        name=f'ингредиент {number}',
+                        measurement_unit=self.random.choice(UNITS))
+                    for number in range(total)
+                ),
+                batch_size=self.batch_size)
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def create_users(self, total):
+        offset = User.objects.aggregate(last=Max('pk'))['last'] or 0
+        password = make_password(None)
+        user_ids = []
+        for start, size in self.batches(total):
+            with transaction.atomic():
+                users = bulk_insert(User, [
+                    User(
+                        username=f'seed{number}',
+                        email=f'seed{number}@example.com',
+                        first_name=self.words(1, 1).capitalize(),
+                        last_name=self.words(1, 1).capitalize(),
+                        password=password)
+                    for number in range(
+                        offset + start + 1, offset + start + size + 1)])
+            user_ids.extend(user.pk for user in users)
+        return user_ids
+
+    def build_recipe(self, author_id, now):
+        return Recipe(
+            author_id=author_id,
+            name=self.words(2, 4).capitalize(),
+            text=self.words(20, 60),
+            cooking_time=min(
+                int(self.random.lognormvariate(3.3, 0.7)) + 1,
+                MAX_COOKING_TIME),
+            pub_date=now - timedelta(
+                seconds=self.random.uniform(
+                    0, PUB_DATE_SPREAD_DAYS * 24 * 3600)))
+
+    def create_recipes(self, total, user_ids, tag_ids, ingredient_ids):
+        authors, cum_weights = self.popularity(user_ids)
+        low, high = INGREDIENTS_PER_RECIPE
+        high = min(high, len(ingredient_ids))
+        low = min(low, high)
+        now = timezone.now()
+        recipe_ids = []
+        for _, size in self.batches(total):
+            with transaction.atomic():
+                recipes = bulk_insert(
+                    Recipe,
+                    [
+                        self.build_recipe(author_id, now)
+                        for author_id in self.random.choices(
+                            authors, cum_weights=cum_weights, k=size)
+                    ])
+                insert_rows(Recipe.tags.through, ('recipe', 'tag'), [
+                    (recipe.pk, tag_id)
+                    for recipe in recipes
+                    for tag_id in self.random.sample(
+                        tag_ids, self.random.randint(1, len(tag_ids)))])
+                insert_rows(
+                    IngredientRecipe, ('recipe', 'ingredient', 'amount'), [
+                        (recipe.pk, ingredient_id,
+                         self.random.randint(1, MAX_AMOUNT))
+                        for recipe in recipes
+                        for ingredient_id in self.random.sample(
+                            ingredient_ids, self.random.randint(low, high))])
+                index_recipes(recipes)
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+        return recipe_ids
+
+    def create_favorites(self, user_ids, recipe_ids, mean):
+        recipes = self.popularity(recipe_ids)
+        for start, size in self.batches(len(user_ids)):
+            insert_rows(Favorite, ('user', 'recipe'), [
+                (user_id, recipe_id)
+                for user_id in user_ids[start:start + size]
+                for recipe_id in self.pick(recipes, mean)])
+
+    def create_subscriptions(self, user_ids, mean):
+        authors = self.popularity(user_ids)
+        for start, size in self.batches(len(user_ids)):
+            Subscription.objects.bulk_create(
+                Subscription(user_id=user_id, author_id=author_id)
+                for user_id in user_ids[start:start + size]
+                for author_id in self.pick(authors, mean, exclude=user_id))
+
+    def create_shopping_lists(self, user_ids, recipe_ids, mean):
+        recipes = self.popularity(recipe_ids)
+        for start, size in self.batches(len(user_ids)):
+            batch_user_ids = user_ids[start:start + size]
+            with transaction.atomic():
+                shopping_lists = bulk_insert(ShoppingList, [
+                    ShoppingList(user_id=user_id)
+                    for user_id in batch_user_ids])
+                insert_rows(
+                    ShoppingList.recipe.through, ('shoppinglist', 'recipe'), [
+                        (shopping_list.pk, recipe_id)
+                        for shopping_list in shopping_lists
+                        for recipe_id in self.pick(recipes, mean)])
+                self.create_cart_items(batch_user_ids)
+
+    @staticmethod
+    def create_cart_items(user_ids):
+        totals = IngredientRecipe.objects.filter(
+            recipe__shopping_list__user__in=user_ids).values_list(
+            'recipe__shopping_list__user', 'ingredient').annotate(
+            total=Sum('amount')).order_by()
+        insert_rows(
+            ShoppingCartItem, ('user', 'ingredient', 'amount'), list(totals))
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.11 on 2026-10-18 03:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from recipes.search import index_recipe
+
+
+def build_search_index(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeSearchTerm = apps.get_model('recipes', 'RecipeSearchTerm')
+    for recipe in Recipe.objects.only('id', 'name', 'text').iterator():
+        index_recipe(recipe, RecipeSearchTerm)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0020_auto_20230525_2228'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=100, verbose_name='Слово')),
+                ('weight', models.PositiveIntegerField(verbose_name='Вес')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Поисковый индекс рецепта',
+                'verbose_name_plural': 'Поисковый индекс рецептов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipesearchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'recipe'), name='unique_search_term'),
+        ),
+        migrations.RunPython(
+            build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.11 on 2026-10-18 03:05
+
+from django.db import migrations, models
+
+from recipes.counters import reconcile_counters
+
+
+def fill_counters(apps, schema_editor):
+    reconcile_counters(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0023_shoppingcartitem'),
+        ('users', '0011_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число добавлений в списки покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.11 on 2026-10-18 03:13
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_rows(model, owner, ingredient_ids, kept_id):
+    for row in model.objects.filter(ingredient_id__in=ingredient_ids):
+        kept = model.objects.filter(
+            **{owner: getattr(row, owner)}, ingredient_id=kept_id).first()
+        if kept is None:
+            row.ingredient_id = kept_id
+            row.save(update_fields=['ingredient'])
+        else:
+            kept.amount += row.amount
+            kept.save(update_fields=['amount'])
+            row.delete()
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShoppingCartItem = apps.get_model('recipes', 'ShoppingCartItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit').annotate(
+        kept_id=Min('id'), total=Count('id')).filter(total__gt=1).order_by()
+    for group in duplicates:
+        ingredient_ids = list(Ingredient.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit']).exclude(
+            id=group['kept_id']).values_list('id', flat=True))
+        merge_rows(IngredientRecipe, 'recipe', ingredient_ids,
+                   group['kept_id'])
+        merge_rows(ShoppingCartItem, 'user', ingredient_ids,
+                   group['kept_id'])
+        Ingredient.objects.filter(id__in=ingredient_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0026_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+    ]
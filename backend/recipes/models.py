@@ -1,9 +1,15 @@
+from collections import Counter
+
 from django.contrib.auth import get_user_model
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Value
+from django.utils import timezone
 
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from recipes.storage import recipe_image_storage
+
 User = get_user_model()
 
 
@@ -20,6 +26,11 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_unit')
+        ]
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}.'
@@ -62,6 +73,55 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def lock(self, recipe_ids):
+        return list(self.select_for_update().filter(
+            pk__in=recipe_ids).order_by('pk').values_list('pk', flat=True))
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_recipes',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient').order_by('id')))
+
+    def latest_by_author(self, author_ids, limit=None):
+        author_ids = list(author_ids)
+        if not author_ids:
+            return []
+        placeholders = ', '.join(['%s'] * len(author_ids))
+        params = author_ids
+        limit_clause = ''
+        if limit:
+            limit_clause = 'WHERE ranked.row_number <= %s'
+            params = author_ids + [limit]
+        return self.raw(
+            'SELECT ranked.id, ranked.author_id, ranked.name, '
+            'ranked.image, ranked.cooking_time FROM ('
+            'SELECT id, author_id, name, image, cooking_time, '
+            'ROW_NUMBER() OVER ('
+            'PARTITION BY author_id ORDER BY id DESC) AS row_number '
+            f'FROM {self.model._meta.db_table} '
+            f'WHERE author_id IN ({placeholders})) ranked '
+            f'{limit_clause} '
+            'ORDER BY ranked.author_id, ranked.id DESC',
+            params)
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=models.BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=models.BooleanField()))
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipe=OuterRef('pk'))))
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -71,10 +131,23 @@ class Recipe(models.Model):
     )
     name = models.CharField(max_length=200)
     image = models.ImageField(
-        upload_to='static/recipe/',
+        upload_to='recipes/images/',
+        storage=recipe_image_storage,
         blank=True,
         null=True,
         verbose_name='Изображение рецепта')
+    image_width = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name='Ширина изображения')
+    image_height = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name='Высота изображения')
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Варианты изображения')
     text = models.TextField(
         verbose_name='Описание рецепта'
     )
@@ -97,6 +170,20 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число добавлений в избранное'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число добавлений в списки покупок'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-id',)
@@ -107,6 +194,71 @@ class Recipe(models.Model):
         return f'{self.author.email}, {self.name}'
 
 
+class RecipeSearchTerm(models.Model):
+    term = models.CharField(
+        max_length=100,
+        db_index=True,
+        verbose_name='Слово'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Рецепт'
+    )
+    weight = models.PositiveIntegerField(
+        verbose_name='Вес'
+    )
+
+    class Meta:
+        verbose_name = 'Поисковый индекс рецепта'
+        verbose_name_plural = 'Поисковый индекс рецептов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'recipe'],
+                name='unique_search_term')
+        ]
+
+
+class IngredientRecipeQuerySet(models.QuerySet):
+
+    def totals(self, recipe_ids):
+        totals = Counter()
+        for ingredient_id, amount in self.filter(
+                recipe_id__in=recipe_ids).values_list(
+                'ingredient_id', 'amount'):
+            totals[ingredient_id] += amount
+        return totals
+
+    def sync(self, recipe, amounts):
+        deltas = Counter()
+        existing = set()
+        stale = []
+        changed = []
+        for row in self.filter(recipe=recipe):
+            existing.add(row.ingredient_id)
+            amount = amounts.get(row.ingredient_id, 0)
+            if amount == row.amount:
+                continue
+            deltas[row.ingredient_id] = amount - row.amount
+            if amount:
+                row.amount = amount
+                changed.append(row)
+            else:
+                stale.append(row.pk)
+        if stale:
+            self.filter(pk__in=stale).delete()
+        if changed:
+            self.bulk_update(changed, ['amount'])
+        created = self.bulk_create([
+            IngredientRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing])
+        deltas.update({row.ingredient_id: row.amount for row in created})
+        return deltas
+
+
 class IngredientRecipe(models.Model):
     amount = models.PositiveIntegerField(
         verbose_name='Количество'
@@ -124,6 +276,8 @@ class IngredientRecipe(models.Model):
         verbose_name='Рецепт'
     )
 
+    objects = IngredientRecipeQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Количество ингредиента'
         verbose_name_plural = 'Количество ингредиентов'
@@ -214,5 +368,134 @@ class ShoppingList(models.Model):
     def __str__(self):
         return (
             f'{self.user.email}, '
-            f'{self.recipes.count()} рецептов'
+            f'{self.recipe.count()} рецептов'
         )
+
+
+class ShoppingCartItemQuerySet(models.QuerySet):
+
+    def apply(self, user_ids, deltas):
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items() if delta}
+        if not user_ids or not deltas:
+            return
+        with transaction.atomic():
+            list(User.objects.select_for_update().filter(
+                pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+            existing = {
+                (item.user_id, item.ingredient_id): item
+                for item in self.select_for_update().filter(
+                    user_id__in=user_ids, ingredient_id__in=deltas)}
+            to_create, to_update, to_delete = [], [], []
+            for user_id in user_ids:
+                for ingredient_id, delta in deltas.items():
+                    item = existing.get((user_id, ingredient_id))
+                    if item is None:
+                        if delta > 0:
+                            to_create.append(self.model(
+                                user_id=user_id,
+                                ingredient_id=ingredient_id,
+                                amount=delta))
+                        continue
+                    item.amount += delta
+                    if item.amount > 0:
+                        to_update.append(item)
+                    else:
+                        to_delete.append(item.pk)
+            self.bulk_create(to_create)
+            self.bulk_update(to_update, ['amount'])
+            self.filter(pk__in=to_delete).delete()
+
+    def add_recipes(self, user, recipe_ids):
+        self.apply([user.pk], IngredientRecipe.objects.totals(recipe_ids))
+
+    def remove_recipes(self, user, recipe_ids):
+        deltas = Counter()
+        deltas.subtract(IngredientRecipe.objects.totals(recipe_ids))
+        self.apply([user.pk], deltas)
+
+    def change_recipe(self, recipe, deltas):
+        user_ids = list(ShoppingList.objects.filter(
+            recipe=recipe).values_list('user_id', flat=True).distinct())
+        self.apply(user_ids, deltas)
+
+
+class ShoppingCartItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_items',
+        verbose_name='Владелец списка покупок'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_items',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество'
+    )
+
+    objects = ShoppingCartItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_item')
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} x {self.amount}'
+
+
+class ModelVersionQuerySet(models.QuerySet):
+
+    def for_model(self, model):
+        version, _ = self.get_or_create(label=model._meta.label_lower)
+        return version
+
+    def for_models(self, *models):
+        versions = {
+            version.label: version
+            for version in self.filter(label__in=[
+                model._meta.label_lower for model in models])}
+        return [
+            versions.get(model._meta.label_lower) or self.for_model(model)
+            for model in models]
+
+    def bump(self, model):
+        updated = self.filter(label=model._meta.label_lower).update(
+            version=F('version') + 1, updated_at=timezone.now())
+        if not updated:
+            self.get_or_create(
+                label=model._meta.label_lower, defaults={'version': 1})
+
+
+class ModelVersion(models.Model):
+    label = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Модель'
+    )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Версия'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    objects = ModelVersionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Версия таблицы'
+        verbose_name_plural = 'Версии таблиц'
+
+    def __str__(self):
+        return f'{self.label}: {self.version}'
@@ -0,0 +1,35 @@
+import re
+from collections import Counter
+
+WORD_RE = re.compile(r'\w+')
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 100
+NAME_WEIGHT = 3
+TEXT_WEIGHT = 1
+
+
+def tokenize(text):
+    return [
+        word[:MAX_TERM_LENGTH]
+        for word in WORD_RE.findall(text.lower().replace('ё', 'е'))
+        if len(word) >= MIN_TERM_LENGTH
+    ]
+
+
+def recipe_terms(name, text):
+    weights = Counter()
+    for term in tokenize(name):
+        weights[term] += NAME_WEIGHT
+    for term in tokenize(text):
+        weights[term] += TEXT_WEIGHT
+    return weights
+
+
+def index_recipe(recipe, term_model=None):
+    if term_model is None:
+        from recipes.models import RecipeSearchTerm
+        term_model = RecipeSearchTerm
+    term_model.objects.filter(recipe_id=recipe.pk).delete()
+    term_model.objects.bulk_create(
+        term_model(recipe_id=recipe.pk, term=term, weight=weight)
+        for term, weight in recipe_terms(recipe.name, recipe.text).items())
@@ -0,0 +1,84 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.counters import change_counter
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    ModelVersion,
+    Recipe,
+    ShoppingCartItem,
+    ShoppingList,
+    Subscription,
+    Tag,
+)
+
+from recipes.search import index_recipe
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not {'name', 'text'} & set(update_fields):
+        return
+    index_recipe(instance)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_model_version(sender, **kwargs):
+    ModelVersion.objects.bump(sender)
+
+
+@receiver(post_save, sender=User)
+def bump_user_version(sender, created, update_fields=None, **kwargs):
+    if created or update_fields and not User.PROFILE_FIELDS & set(
+            update_fields):
+        return
+    ModelVersion.objects.bump(User)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_from_shopping_carts(sender, instance, **kwargs):
+    Recipe.objects.lock([instance.pk])
+    deltas = Counter()
+    deltas.subtract(IngredientRecipe.objects.totals([instance.pk]))
+    ShoppingCartItem.objects.change_recipe(instance, deltas)
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    User.objects.filter(pk=instance.author_id, recipes_count__gt=0).update(
+        recipes_count=F('recipes_count') - 1)
+
+
+@receiver(pre_delete, sender=User)
+def uncount_deleted_user(sender, instance, **kwargs):
+    relations = (
+        (Recipe, 'favorites_count',
+         Favorite.objects.filter(user=instance), 'recipe_id'),
+        (Recipe, 'in_carts_count',
+         ShoppingList.recipe.through.objects.filter(
+             shoppinglist__user=instance), 'recipe_id'),
+        (User, 'followers_count',
+         Subscription.objects.filter(user=instance), 'author_id'),
+    )
+    for model, counter, related, field in relations:
+        amounts = Counter()
+        amounts.subtract(related.values_list(field, flat=True))
+        change_counter(model, counter, amounts)
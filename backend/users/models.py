@@ -4,6 +4,9 @@ from django.db import models
 
 
 class User(AbstractUser):
+    PROFILE_FIELDS = frozenset(
+        ('email', 'username', 'first_name', 'last_name'))
+
     email = models.EmailField(
         unique=True,
         max_length=254)
@@ -17,6 +20,12 @@ class User(AbstractUser):
     password = models.CharField(max_length=150)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число рецептов')
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков')
 
     class Meta:
         constraints = [